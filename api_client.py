@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# API URL
+API_URL = os.getenv('API_URL', 'http://localhost:5000')
+
+# Seconds a user's pack list is reused before it is fetched again
+PACKS_CACHE_TTL = int(os.getenv('PACKS_CACHE_TTL', '60'))
+
+# Keep-alive connections held open to the API, shared by all sessions
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '20'))
+
+_session = None
+_session_lock = threading.Lock()
+
+# Pack lists per access token: token -> (fetched_at, packs)
+_packs_cache = {}
+_packs_cache_lock = threading.Lock()
+
+# Shared requests session with a pooled keep-alive adapter
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def _auth_headers(access_token):
+    return {'Authorization': f'Bearer {access_token}'}
+
+# Transform an API pack into the format shown in the UI
+def format_pack(pack):
+    return {
+        'Pack Name': pack['pack_name'],
+        'Description': pack['description'],
+        'Date Created': pack['date_created'].split('T')[0] if 'T' in pack['date_created'] else pack['date_created'],
+        'Pack ID': pack['id']
+    }
+
+def login(username, password):
+    return get_session().post(f'{API_URL}/login', json={'username': username, 'password': password})
+
+def register(username, email, password):
+    return get_session().post(
+        f'{API_URL}/register',
+        json={'username': username, 'email': email, 'password': password}
+    )
+
+# Fetch the user's packs, reusing a cached list for up to PACKS_CACHE_TTL seconds.
+# Returns None when the API responds with an error.
+def get_packs(access_token, max_age=PACKS_CACHE_TTL):
+    with _packs_cache_lock:
+        cached = _packs_cache.get(access_token)
+        if cached is not None and time.time() - cached[0] < max_age:
+            return [dict(pack) for pack in cached[1]]
+
+    response = get_session().get(f'{API_URL}/user/packs', headers=_auth_headers(access_token))
+    if response.status_code != 200:
+        logging.error("Failed to fetch packs: %s", response.text)
+        return None
+
+    packs = [format_pack(pack) for pack in response.json()]
+    with _packs_cache_lock:
+        _packs_cache[access_token] = (time.time(), packs)
+    return [dict(pack) for pack in packs]
+
+# Create a pack and add it to the cached pack list
+def create_pack(access_token, pack_name, description):
+    response = get_session().post(
+        f'{API_URL}/user/packs',
+        headers=_auth_headers(access_token),
+        json={'pack_name': pack_name, 'description': description}
+    )
+    if response.status_code in [200, 201]:
+        try:
+            created = format_pack(response.json())
+        except (ValueError, KeyError, TypeError, AttributeError):
+            created = None
+        with _packs_cache_lock:
+            cached = _packs_cache.get(access_token)
+            if created is not None and cached is not None:
+                cached[1].append(created)
+            else:
+                # The response does not describe the new pack; fetch the list again next time
+                _packs_cache.pop(access_token, None)
+    return response
+
+# Delete a pack and drop it from the cached pack list
+def delete_pack(access_token, pack_id):
+    response = get_session().delete(f'{API_URL}/user/packs/{pack_id}', headers=_auth_headers(access_token))
+    if response.status_code in [200, 204]:
+        with _packs_cache_lock:
+            cached = _packs_cache.get(access_token)
+            if cached is not None:
+                cached[1][:] = [pack for pack in cached[1] if pack['Pack ID'] != pack_id]
+    return response
+
+# Forget the cached pack list for a user, e.g. on logout
+def invalidate_packs(access_token):
+    with _packs_cache_lock:
+        _packs_cache.pop(access_token, None)
@@ -0,0 +1,63 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_data import format_dataframe_columns
+
+# Row-by-row formatting as format_data_for_pinecone did it before the columnar path
+def format_rows_iterrows(data):
+    formatted_data = []
+    for i, row in data.iterrows():
+        text = ' '.join(str(value) for value in row.values)
+        formatted_data.append({"id": f"vec{i+1}", "text": text})
+    return formatted_data
+
+# Columnar formatting, without the per-chunk size logging
+def format_rows_columnar(data):
+    ids, texts = format_dataframe_columns(data)
+    return [{"id": id_, "text": text} for id_, text in zip(ids.tolist(), texts.tolist())]
+
+# Build a synthetic DataFrame shaped like our customer exports
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Index': np.arange(1, rows + 1),
+        'Customer Id': [f"{value:016x}" for value in rng.integers(0, 2**62, rows)],
+        'First Name': rng.choice(['Ada', 'Grace', 'Alan', 'Linus', 'Guido'], rows),
+        'Company': rng.choice(['Acme Ltd', 'Globex', 'Initech', None], rows),
+        'Score': rng.random(rows) * 100,
+        'Subscription Date': pd.date_range('2020-01-01', periods=rows, freq='min'),
+    })
+
+def time_rows_per_second(function, data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - start)
+    return len(data) / best if best else float('inf')
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare iterrows and columnar DataFrame formatting.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'rows':>10} {'iterrows rows/s':>18} {'columnar rows/s':>18} {'speedup':>8}")
+    for rows in args.rows:
+        data = make_frame(rows)
+        if format_rows_iterrows(data) != format_rows_columnar(data):
+            sys.exit(f"Columnar output differs from iterrows output at {rows} rows")
+        legacy = time_rows_per_second(format_rows_iterrows, data, args.repeat)
+        columnar = time_rows_per_second(format_rows_columnar, data, args.repeat)
+        print(f"{rows:>10} {legacy:>18,.0f} {columnar:>18,.0f} {columnar / legacy:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
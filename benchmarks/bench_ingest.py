@@ -0,0 +1,233 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_format import make_frame
+from bench_split import make_document, make_page
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_ingest.json')
+
+# kind:size pairs. csv sizes are rows, text and page sizes megabytes, site sizes pages.
+DEFAULT_SCENARIOS = ['csv:10000', 'csv:100000', 'text:8', 'page:4', 'site:50']
+SCALE_SCENARIOS = ['csv:1000000', 'csv:10000000', 'text:256', 'site:500']
+
+CSV_WRITE_ROWS = 1_000_000
+
+# Write a synthetic customer CSV in pieces, so 10M rows never sit in memory
+def write_csv(path, rows):
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        while written < rows:
+            count = min(CSV_WRITE_ROWS, rows - written)
+            frame = make_frame(count, seed=written)
+            frame['Index'] += written
+            frame.to_csv(f, index=False, header=written == 0)
+            written += count
+
+def write_text(path, megabytes):
+    with open(path, 'w', encoding='utf-8') as f:
+        for part in range(int(megabytes)):
+            f.write(make_document(1024 * 1024, seed=part))
+
+# Fixture files, generated once per size and reused between runs
+def fixture_path(directory, kind, size):
+    path = os.path.join(directory, f"{kind}-{size}.{'csv' if kind == 'csv' else 'txt'}")
+    if not os.path.exists(path):
+        print(f"Generating {path} ...", file=sys.stderr)
+        temp_path = path + '.tmp'
+        write_csv(temp_path, int(size)) if kind == 'csv' else write_text(temp_path, float(size))
+        os.replace(temp_path, path)
+    return path
+
+# Local HTTP server for the web scenarios: /page-<mb> is one large HTML page,
+# /site/<i> are small pages that /site/index links to
+def serve_fixtures(site_pages):
+    pages = {}
+
+    def page(path):
+        if path not in pages:
+            if path.startswith('/page-'):
+                text = make_page(int(float(path[6:]) * 1024 * 1024), seed=1)
+                body = '<html><body>' + ''.join(f'<p>{line}</p>' for line in text.split('\n')) + '</body></html>'
+            elif path == '/site/index':
+                body = '<html><body>' + ''.join(f'<a href="/site/{i}">page {i}</a>' for i in range(site_pages)) + '</body></html>'
+            elif path.startswith('/site/'):
+                number = int(path[6:])
+                body = f'<html><body><h1>Page {number}</h1><p>{make_document(20_000, seed=number)}</p></body></html>'
+            else:
+                return None
+            pages[path] = body.encode('utf-8')
+        return pages[path]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = page(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _stage_seconds(snapshot):
+    stages = {}
+    for histogram in snapshot['histograms']:
+        if histogram['name'] == 'stage_seconds':
+            stage = histogram['labels']['stage']
+            stages[stage] = stages.get(stage, 0.0) + histogram['sum']
+        elif histogram['name'] == 'lambda_invoke_seconds':
+            stages['invoke'] = stages.get('invoke', 0.0) + histogram['sum']
+    return stages
+
+# Run one scenario in this process and return its measurements. Runs in a child
+# process so peak RSS belongs to the scenario alone.
+def run_scenario(kind, size, target, latency, workers):
+    logging.disable(logging.CRITICAL)
+
+    import manifest
+    from crawler import iter_crawl_chunks
+    from load_data import load_csv_chunks, load_file_chunks, load_web
+    from local_lambda import LocalLambda
+    from metrics import get_metrics
+    from upload_data import upload_to_pinecone
+    from upload_journal import UploadJournal
+    from web_cache import WebCache
+
+    # Fresh manifests, journal and web cache, so nothing is skipped as already uploaded
+    state = tempfile.mkdtemp(prefix='packman-bench-')
+    manifest.MANIFEST_DIR = os.path.join(state, 'manifests')
+    journal = UploadJournal(os.path.join(state, 'uploads.sqlite3'))
+
+    start = time.perf_counter()
+    if kind == 'csv':
+        data = load_csv_chunks([target])
+    elif kind == 'text':
+        data = load_file_chunks(target)
+    elif kind == 'page':
+        data = load_web(target, cache=WebCache(os.path.join(state, 'web')))
+    elif kind == 'site':
+        data = iter_crawl_chunks([target], max_depth=1, max_pages=int(size) + 1)
+    else:
+        raise ValueError(f"Unknown scenario kind: {kind}")
+
+    lambda_client = LocalLambda(latency=latency, keep_records=False)
+    summary = upload_to_pinecone(data, 'bench', 'bench', lambda_client=lambda_client, max_workers=workers,
+                                 source=f"bench:{kind}:{size}", journal=journal)
+    seconds = time.perf_counter() - start
+    stages = _stage_seconds(get_metrics().snapshot())
+    input_bytes = os.path.getsize(target) if kind in ('csv', 'text') else lambda_client.bytes_received
+    return {
+        "records": lambda_client.records_received,
+        "failed_batches": len(summary['failed']),
+        "seconds": seconds,
+        "records_per_second": lambda_client.records_received / seconds if seconds else 0.0,
+        "mb_per_second": input_bytes / (1024 * 1024) / seconds if seconds else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": stages,
+    }
+
+def run_child(scenario, target, args):
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario, target,
+               '--latency', str(args.latency), '--workers', str(args.workers)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.exit(f"Scenario {scenario} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# Scenarios slower or larger than the baseline by more than tolerance
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for scenario, result in results.items():
+        reference = baseline.get(scenario)
+        if reference is None:
+            continue
+        if result['records_per_second'] < reference['records_per_second'] * (1 - tolerance):
+            regressions.append(f"{scenario}: {result['records_per_second']:,.0f} records/s, "
+                               f"baseline {reference['records_per_second']:,.0f}")
+        if result['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{scenario}: peak RSS {result['peak_rss_mb']:,.0f} MB, "
+                               f"baseline {reference['peak_rss_mb']:,.0f} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load -> format -> batch -> upload against a local Lambda.")
+    parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS,
+                        help="kind:size pairs (csv rows, text/page MB, site pages); 'scale' adds the 1M-10M row runs")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds the local Lambda waits per call")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'packman-bench-fixtures'))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="record these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown or RSS growth")
+    parser.add_argument('--child', nargs=2, metavar=('SCENARIO', 'TARGET'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, size = args.child[0].split(':')
+        print(json.dumps(run_scenario(kind, size, args.child[1], args.latency, args.workers)))
+        return
+
+    scenarios = [scenario for name in args.scenarios
+                 for scenario in (SCALE_SCENARIOS if name == 'scale' else [name])]
+    os.makedirs(args.fixtures, exist_ok=True)
+    site_pages = max([int(s.split(':')[1]) for s in scenarios if s.startswith('site:')] or [0])
+    server = serve_fixtures(site_pages)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {}
+    print(f"{'scenario':>14} {'records':>10} {'seconds':>8} {'records/s':>11} {'MB/s':>7} {'RSS MB':>7} "
+          f"{'load':>7} {'format':>7} {'batch':>7} {'invoke':>7}")
+    for scenario in scenarios:
+        kind, size = scenario.split(':')
+        if kind in ('csv', 'text'):
+            target = fixture_path(args.fixtures, kind, size)
+        elif kind == 'page':
+            target = f"{base_url}/page-{size}"
+        else:
+            target = f"{base_url}/site/index"
+        result = results[scenario] = run_child(scenario, target, args)
+        stages = result['stages']
+        print(f"{scenario:>14} {result['records']:>10,} {result['seconds']:>8.2f} {result['records_per_second']:>11,.0f} "
+              f"{result['mb_per_second']:>7.1f} {result['peak_rss_mb']:>7.0f} {stages.get('load', 0):>7.2f} "
+              f"{stages.get('format', 0):>7.2f} {stages.get('batch', 0):>7.2f} {stages.get('invoke', 0):>7.2f}")
+    server.shutdown()
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit("Regressions against the baseline:\n" + '\n'.join(regressions))
+        print("No regressions against the baseline.")
+
+if __name__ == '__main__':
+    main()
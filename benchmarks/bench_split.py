@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import TextChunker
+
+WORDS = ['pack', 'vector', 'index', 'customer', 'order', 'the', 'a', 'of', 'embedding', 'query',
+         'latency', 'throughput', 'record', 'upload', 'Pinecone', 'streamlit', 'lambda', 'chunk']
+
+# Text shaped like BeautifulSoup output of a large page: many short lines from
+# navigation and table cells between longer paragraphs
+def make_page(chars, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < chars:
+        if rng.random() < 0.6:
+            part = ' '.join(rng.choices(WORDS, k=rng.randint(1, 4))) + '\n'
+        else:
+            part = '. '.join(' '.join(rng.choices(WORDS, k=rng.randint(8, 20)))
+                             for _ in range(rng.randint(2, 6))) + '.\n\n'
+        parts.append(part)
+        size += len(part)
+    return ''.join(parts)
+
+# Text shaped like a long prose file: paragraphs of sentences
+def make_document(chars, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < chars:
+        part = ' '.join(' '.join(rng.choices(WORDS, k=rng.randint(6, 25))).capitalize() + '.'
+                        for _ in range(rng.randint(3, 10))) + '\n\n'
+        parts.append(part)
+        size += len(part)
+    return ''.join(parts)
+
+def time_split(function, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = function(text)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the chunking engine with RecursiveCharacterTextSplitter.")
+    parser.add_argument('--megabytes', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    recursive = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    chunker = TextChunker(args.chunk_size, args.chunk_overlap)
+
+    print(f"{'text':>10} {'MB':>6} {'recursive MB/s':>15} {'chunker MB/s':>13} {'speedup':>8} "
+          f"{'chunks':>15} {'max len':>8}")
+    for megabytes in args.megabytes:
+        chars = int(megabytes * 1024 * 1024)
+        for name, text in (('page', make_page(chars)), ('document', make_document(chars))):
+            legacy_seconds, legacy_chunks = time_split(recursive.split_text, text, args.repeat)
+            seconds, chunks = time_split(chunker.split, text, args.repeat)
+            if max(map(len, chunks)) > args.chunk_size:
+                sys.exit(f"Chunker produced a chunk over {args.chunk_size} characters")
+            print(f"{name:>10} {megabytes:>6g} {megabytes / legacy_seconds:>15.1f} {megabytes / seconds:>13.1f} "
+                  f"{legacy_seconds / seconds:>7.1f}x {len(legacy_chunks):>7}/{len(chunks):<7} "
+                  f"{max(map(len, chunks)):>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules streamlit_app.py imports at the top (Streamlit itself is left out)
+APP_MODULES = ['api_client', 'load_data', 'jobs', 'manifest', 'staging', 'upload_data']
+
+# Seconds to import modules in a fresh interpreter, the cold-start cost of a new app process
+def cold_import_seconds(modules, repeat):
+    code = ("import sys, time; sys.path.insert(0, %r); start = time.perf_counter(); import %s; "
+            "print(time.perf_counter() - start)") % (ROOT, ', '.join(modules))
+    timings = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+def best_seconds(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Per-rerun cost of building the Lambda client: a new boto3 session and client,
+# as the app did on every rerun, against fetching the shared client
+def client_seconds(repeat):
+    import boto3
+
+    def build():
+        boto3.Session(aws_access_key_id='key', aws_secret_access_key='secret', region_name='us-east-1').client('lambda')
+
+    timings = {"new session and client": best_seconds(build, repeat)}
+    try:
+        from upload_data import get_lambda_client
+    except ImportError:
+        return timings
+    os.environ.setdefault('ACCESS_KEY', 'key')
+    os.environ.setdefault('SECRET_KEY', 'secret')
+    os.environ.setdefault('REGION', 'us-east-1')
+    get_lambda_client()
+    timings["shared client"] = best_seconds(get_lambda_client, repeat)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app cold-start imports and per-rerun client setup.")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'cold import':<64} {'seconds':>8}")
+    print(f"{', '.join(APP_MODULES):<64} {cold_import_seconds(APP_MODULES, args.repeat):>8.3f}")
+    for module in APP_MODULES + ['crawler']:
+        print(f"{module:<64} {cold_import_seconds([module], args.repeat):>8.3f}")
+    print()
+    print(f"{'per rerun':<64} {'seconds':>8}")
+    for name, seconds in client_seconds(args.repeat).items():
+        print(f"{name:<64} {seconds:>8.4f}")
+
+if __name__ == '__main__':
+    main()
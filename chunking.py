@@ -0,0 +1,113 @@
+import functools
+import os
+
+# Rough characters per token, used when chunk sizes are given in tokens
+CHARS_PER_TOKEN = int(os.getenv('CHARS_PER_TOKEN', '4'))
+
+# Break points in order of preference: paragraphs, lines, sentences, words
+TEXT_SEPARATORS = ("\n\n", "\n", ". ", "? ", "! ", "; ", ", ", " ")
+
+# Markdown also breaks before headings, horizontal rules and code fences
+MARKDOWN_SEPARATORS = ("\n# ", "\n## ", "\n### ", "\n#### ", "\n```", "\n---", "\n\n", "\n", ". ", " ")
+
+_WHITESPACE = (" ", "\n", "\t")
+
+# Splits text into overlapping chunks of at most chunk_size characters (or
+# approximate tokens), preferring the earliest separator in the list as the
+# break point. It makes one pass over the text and only works with offsets:
+# the sole strings it builds are the chunks it returns, and overlapping text
+# is re-read by index rather than copied.
+class TextChunker:
+    def __init__(self, chunk_size=1000, chunk_overlap=200, unit='chars', separators=TEXT_SEPARATORS):
+        if unit == 'chars':
+            scale = 1
+        elif unit == 'tokens':
+            scale = CHARS_PER_TOKEN
+        else:
+            raise ValueError(f"Unknown chunk unit: {unit}")
+        if chunk_size <= 0 or chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError(f"Invalid chunk size {chunk_size} with overlap {chunk_overlap}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+        self.separators = tuple(separators)
+        self._size = chunk_size * scale
+        self._overlap = chunk_overlap * scale
+
+    # Key identifying the output of this configuration, for caching chunks
+    @property
+    def settings(self):
+        names = '|'.join(separator.encode('unicode_escape').decode('ascii') for separator in self.separators)
+        return f"chunker:{self.unit}:{self.chunk_size}:{self.chunk_overlap}:{names}"
+
+    # Offset where a chunk starting at start and ending at or before limit breaks
+    def _break(self, text, start, limit):
+        # Prefer a break in the last quarter of the window so chunks stay full,
+        # then accept any break before giving up and cutting mid-word
+        for low in (start + self._size * 3 // 4, start + 1):
+            for separator in self.separators:
+                index = text.rfind(separator, low, limit)
+                if index != -1:
+                    # Separators starting with a newline break right after it, so
+                    # headings open the next chunk; the rest stay with this one
+                    return index + 1 if separator[0] == "\n" else index + len(separator)
+        return limit
+
+    # Where the chunk after one ending at end starts, overlap characters back
+    # and moved forward to the next word
+    def _next_start(self, text, start, end):
+        if not self._overlap:
+            return end
+        low = max(start + 1, end - self._overlap)
+        best = -1
+        for separator in _WHITESPACE:
+            index = text.find(separator, low, end)
+            if index != -1 and (best == -1 or index < best):
+                best = index
+        return best + 1 if best != -1 else low
+
+    # Chunks of text[position:], and the offset of the text not yet chunked.
+    # Unless final, stops before a window that runs past the end of the text,
+    # since more text may still arrive.
+    def _split(self, text, position, final):
+        chunks = []
+        length = len(text)
+        while True:
+            while position < length and text[position] in " \n\t\r":
+                position += 1
+            if position >= length:
+                return chunks, position
+            limit = position + self._size
+            if limit >= length:
+                if not final:
+                    return chunks, position
+                chunks.append(text[position:].rstrip())
+                return chunks, length
+            end = self._break(text, position, limit)
+            chunk = text[position:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            position = self._next_start(text, position, end)
+
+    def split(self, text):
+        return self._split(text, 0, True)[0]
+
+    # Chunk a stream of text blocks, e.g. a file read piece by piece. Yields the
+    # same chunks as split() would for the joined text, holding at most one
+    # block plus one chunk in memory.
+    def iter_chunks(self, blocks):
+        carry = ''
+        for block in blocks:
+            if not block:
+                continue
+            buffer = carry + block
+            chunks, position = self._split(buffer, 0, False)
+            yield from chunks
+            carry = buffer[position:]
+        yield from self._split(carry, 0, True)[0]
+
+# Shared chunker for a configuration; chunkers hold no state between calls
+@functools.lru_cache(maxsize=32)
+def get_chunker(chunk_size=1000, chunk_overlap=200, unit='chars', markdown=False):
+    separators = MARKDOWN_SEPARATORS if markdown else TEXT_SEPARATORS
+    return TextChunker(chunk_size, chunk_overlap, unit, separators)
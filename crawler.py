@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from urllib.parse import urldefrag, urljoin, urlsplit
+import aiohttp
+from bs4 import BeautifulSoup
+from chunking import get_chunker
+from load_data import TEXT_CHUNK_OVERLAP, TEXT_CHUNK_SIZE, TEXT_CHUNK_UNIT, WEB_HEADERS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Pages fetched at once in total and from any one host
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '16'))
+CRAWL_PER_HOST = int(os.getenv('CRAWL_PER_HOST', '4'))
+
+# Default limits: links followed this many hops from the seeds, pages in total
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', '1'))
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '200'))
+
+# Seconds allowed per page, and fetched pages held for a slow consumer before
+# the crawl pauses
+CRAWL_TIMEOUT = int(os.getenv('CRAWL_TIMEOUT', '30'))
+CRAWL_BUFFER_PAGES = 32
+
+_PAGE_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+_SITEMAP_TYPES = ('application/xml', 'text/xml')
+
+# Links to these are never pages, so they are not fetched
+_SKIP_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.css', '.js', '.pdf', '.zip',
+                    '.gz', '.tar', '.mp3', '.mp4', '.woff', '.woff2')
+
+# URL without its fragment, so page.html#a and page.html#b are crawled once
+def normalize_url(url):
+    url = urldefrag(url)[0]
+    parts = urlsplit(url)
+    return parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower(), path=parts.path or '/').geturl()
+
+def is_sitemap_url(url):
+    path = urlsplit(url).path.lower()
+    return path.endswith('.xml') and 'sitemap' in path
+
+# Page and nested sitemap URLs listed in a sitemap or sitemap index
+def parse_sitemap(body):
+    pages, sitemaps = [], []
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError as e:
+        logging.warning("Skipping unreadable sitemap: %s", e)
+        return pages, sitemaps
+    nested = root.tag.endswith('sitemapindex')
+    for element in root.iter():
+        if element.tag.endswith('loc') and element.text:
+            (sitemaps if nested else pages).append(element.text.strip())
+    return pages, sitemaps
+
+def _host_allowed(url, allowed_domains):
+    host = urlsplit(url).hostname or ''
+    return any(host == domain or host.endswith('.' + domain) for domain in allowed_domains)
+
+# Text and outgoing http(s) links of an HTML page
+def parse_page(body, url, content_type):
+    if content_type == 'text/plain':
+        return body, []
+    soup = BeautifulSoup(body, 'html.parser')
+    links = []
+    for anchor in soup.find_all('a', href=True):
+        link = urljoin(url, anchor['href'])
+        parts = urlsplit(link)
+        if parts.scheme in ('http', 'https') and not parts.path.lower().endswith(_SKIP_EXTENSIONS):
+            links.append(normalize_url(link))
+    return soup.get_text(), links
+
+# Breadth-first crawler over seed URLs, URL lists and sitemaps. Pages are
+# fetched concurrently with aiohttp, with connection limits overall and per
+# host, and handed to emit(url, text) as they arrive. Links are followed up to
+# max_depth hops within allowed_domains (by default the seeds' hosts and their
+# subdomains); sitemap entries count as seeds.
+class Crawler:
+    def __init__(self, seeds, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES, allowed_domains=None,
+                 concurrency=CRAWL_CONCURRENCY, per_host=CRAWL_PER_HOST, timeout=CRAWL_TIMEOUT):
+        self.seeds = [normalize_url(seed) for seed in seeds]
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.allowed_domains = [domain.lower() for domain in allowed_domains] if allowed_domains else \
+            sorted({urlsplit(seed).hostname for seed in self.seeds if urlsplit(seed).hostname})
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.stats = {"pages": 0, "failed": 0, "skipped": 0, "sitemaps": 0}
+
+    def _schedule(self, queue, seen, url, depth):
+        # Called from the event loop thread only
+        if url in seen or not _host_allowed(url, self.allowed_domains):
+            return
+        sitemap = is_sitemap_url(url)
+        if not sitemap:
+            if self._scheduled >= self.max_pages:
+                return
+            self._scheduled += 1
+        seen.add(url)
+        queue.put_nowait((url, depth, sitemap))
+
+    async def _visit(self, session, queue, seen, emit, url, depth, sitemap):
+        async with session.get(url, headers=WEB_HEADERS) as response:
+            if response.status != 200:
+                logging.warning("Crawl of %s returned status %d.", url, response.status)
+                self.stats["failed"] += 1
+                return
+            content_type = response.content_type
+            if sitemap or content_type in _SITEMAP_TYPES:
+                pages, sitemaps = parse_sitemap(await response.read())
+                self.stats["sitemaps"] += 1
+                for link in sitemaps:
+                    self._schedule(queue, seen, normalize_url(link), depth)
+                for link in pages:
+                    self._schedule(queue, seen, normalize_url(link), 0)
+                return
+            if content_type not in _PAGE_TYPES:
+                logging.info("Skipping %s with content type %s.", url, content_type)
+                self.stats["skipped"] += 1
+                return
+            body = await response.text(errors='replace')
+
+        # Parse off the event loop so fetches continue meanwhile
+        text, links = await asyncio.to_thread(parse_page, body, url, content_type)
+        self.stats["pages"] += 1
+        await emit(url, text)
+        if depth < self.max_depth:
+            for link in links:
+                self._schedule(queue, seen, link, depth + 1)
+
+    async def _worker(self, session, queue, seen, emit):
+        while True:
+            url, depth, sitemap = await queue.get()
+            try:
+                await self._visit(session, queue, seen, emit, url, depth, sitemap)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+                logging.warning("Failed to crawl %s: %s", url, e)
+                self.stats["failed"] += 1
+            finally:
+                queue.task_done()
+
+    # Crawl until every reachable page within the limits has been emitted.
+    # emit is a coroutine function taking (url, text).
+    async def run(self, emit):
+        queue = asyncio.Queue()
+        seen = set()
+        self._scheduled = 0
+        for seed in self.seeds:
+            self._schedule(queue, seen, seed, 0)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [asyncio.create_task(self._worker(session, queue, seen, emit)) for _ in range(self.concurrency)]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        logging.info("Crawl finished: %d pages, %d failed, %d skipped, %d sitemaps.", self.stats["pages"],
+                     self.stats["failed"], self.stats["skipped"], self.stats["sitemaps"])
+        return self.stats
+
+# Crawl from synchronous code, yielding (url, text) per page as soon as it is
+# fetched. The crawl runs on its own event loop thread and pauses while
+# CRAWL_BUFFER_PAGES pages wait to be consumed; closing the generator early
+# cancels it.
+def iter_crawl(seeds, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES, allowed_domains=None,
+               concurrency=CRAWL_CONCURRENCY, per_host=CRAWL_PER_HOST, timeout=CRAWL_TIMEOUT):
+    crawler = Crawler(seeds, max_depth, max_pages, allowed_domains, concurrency, per_host, timeout)
+    loop = asyncio.new_event_loop()
+    pages = asyncio.Queue(maxsize=CRAWL_BUFFER_PAGES)
+    done = object()
+
+    async def emit(url, text):
+        await pages.put((url, text))
+
+    async def crawl():
+        try:
+            await crawler.run(emit)
+        except Exception:
+            await pages.put(done)
+            raise
+        await pages.put(done)
+
+    async def start():
+        return asyncio.create_task(crawl())
+
+    async def finish(task):
+        # Cancel an unfinished crawl and let it close its connections before the loop stops
+        if not task.done():
+            task.cancel()
+        outcome = (await asyncio.gather(task, return_exceptions=True))[0]
+        await loop.shutdown_default_executor()
+        return outcome
+
+    def call(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    thread = threading.Thread(target=loop.run_forever, name="crawler", daemon=True)
+    thread.start()
+    task = call(start())
+    completed = False
+    try:
+        while True:
+            page = call(pages.get())
+            if page is done:
+                completed = True
+                break
+            yield page
+    finally:
+        outcome = call(finish(task))
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    # Surface errors from the crawl itself
+    if completed and isinstance(outcome, Exception):
+        raise outcome
+
+# Crawl and chunk pages for upload_to_pinecone, yielding one list of chunks per page
+def iter_crawl_chunks(seeds, chunk_size=TEXT_CHUNK_SIZE, chunk_overlap=TEXT_CHUNK_OVERLAP, unit=TEXT_CHUNK_UNIT,
+                      **options):
+    chunker = get_chunker(chunk_size, chunk_overlap, unit)
+    for url, text in iter_crawl(seeds, **options):
+        texts = chunker.split(text)
+        logging.info("Crawled %s: %d chunks.", url, len(texts))
+        if texts:
+            yield texts
+
+# Seeds from user input: one URL per line or separated by spaces
+def parse_seeds(text):
+    return [seed for seed in text.split() if urlsplit(seed).scheme in ('http', 'https')]
@@ -0,0 +1,133 @@
+import os
+import numpy as np
+
+# Estimated Jaccard similarity at which a chunk counts as a near duplicate of
+# an earlier one, when near-duplicate removal is turned on
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.9'))
+
+# MinHash signature length; longer signatures estimate similarity more closely
+DEDUP_NUM_PERM = int(os.getenv('DEDUP_NUM_PERM', '64'))
+
+# Characters per shingle. Text is compared as the set of its overlapping
+# character n-grams, which works for prose and for short CSV rows alike.
+DEDUP_SHINGLE = 5
+
+# Text bytes whose signatures are computed in one vectorized pass
+DEDUP_GROUP_BYTES = 64 * 1024
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Bands and rows per band for LSH over num_perm hashes: the split whose
+# candidate threshold (1/bands)^(1/rows) is closest to threshold
+def lsh_params(threshold, num_perm):
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+def _normalize(text):
+    return ' '.join(text.lower().split()).encode('utf-8')
+
+# 32-bit hashes of the distinct overlapping shingles of several texts,
+# lowercased and with whitespace collapsed, as one array plus the offset where
+# each text starts. Texts shorter than a shingle are padded to one.
+def shingle_hashes(texts, size=DEDUP_SHINGLE):
+    encoded = [_normalize(text).ljust(size, b'\0') for text in texts]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    # Shingles starting in the last size - 1 bytes of a text run into the
+    # next one; they are dropped, leaving lengths - size + 1 per text
+    count = len(data) - size + 1
+    values = data[:count].copy()
+    for shift in range(1, size):
+        values |= data[shift:shift + count] << np.uint64(8 * shift)
+    offsets = np.arange(count) - np.repeat(starts, lengths)[:count]
+    keep = offsets <= np.repeat(lengths - size, lengths)[:count]
+    hashes = (values[keep] * _MIX) >> np.uint64(32)
+
+    # Repeated shingles of a text are hashed once: unique (text, hash) keys
+    # keep the texts in order
+    text_ids = np.repeat(np.arange(len(texts), dtype=np.uint64), lengths - size + 1)
+    keys = np.unique((text_ids << np.uint64(32)) | hashes)
+    shingle_starts = np.searchsorted(keys >> np.uint64(32), np.arange(len(texts), dtype=np.uint64))
+    return keys & np.uint64(0xFFFFFFFF), shingle_starts
+
+# Remembers the chunks it has seen and flags new ones whose estimated Jaccard
+# similarity to a seen chunk reaches threshold. Candidates are found with
+# MinHash signatures banded into LSH buckets and confirmed against the stored
+# signature, so the check costs about the same however many chunks were seen.
+# Memory grows with the number of distinct chunks: one signature and one
+# bucket entry per band each.
+class NearDuplicateFilter:
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM, shingle=DEDUP_SHINGLE, seed=1):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        # Multiply-shift hash functions: the top 32 bits of a * x + b, a odd
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = generator.randint(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._count = 0
+
+    # MinHash signatures of texts, one row each
+    def signatures(self, texts):
+        hashes, starts = shingle_hashes(texts, self.shingle)
+        permuted = ((self._a * hashes + self._b) >> np.uint64(32)).astype(np.uint32)
+        return np.minimum.reduceat(permuted, starts, axis=1).T
+
+    # Whether text nearly duplicates a chunk seen before; if not, it is
+    # remembered so later chunks are compared with it
+    def check(self, text):
+        return self.check_many([text])[0]
+
+    # check() for several texts in order, with signatures computed in groups
+    def check_many(self, texts):
+        results = []
+        group, group_bytes = [], 0
+        for text in texts:
+            group.append(text)
+            group_bytes += len(text)
+            if group_bytes >= DEDUP_GROUP_BYTES:
+                results.extend(self._check_signatures(self.signatures(group)))
+                group, group_bytes = [], 0
+        if group:
+            results.extend(self._check_signatures(self.signatures(group)))
+        return results
+
+    def _check_signatures(self, signatures):
+        results = []
+        for signature in signatures:
+            keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+            results.append(self._is_near_duplicate(signature, keys))
+            if not results[-1]:
+                self._remember(signature, keys)
+        return results
+
+    def _is_near_duplicate(self, signature, keys):
+        checked = set()
+        for bucket, key in zip(self._buckets, keys):
+            for index in bucket.get(key, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                if np.count_nonzero(self._signatures[index] == signature) >= self.threshold * self.num_perm:
+                    return True
+        return False
+
+    def _remember(self, signature, keys):
+        if self._count == len(self._signatures):
+            self._signatures = np.resize(self._signatures, (2 * len(self._signatures), self.num_perm))
+        self._signatures[self._count] = signature
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(self._count)
+        self._count += 1
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from dedup import DEDUP_THRESHOLD
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Worker processes used by default; each loads, formats and uploads its packs
+INGEST_PROCESSES = int(os.getenv('INGEST_PROCESSES', str(os.cpu_count() or 1)))
+
+# Read an ingest manifest of (source, pack) pairs: a CSV file with source and
+# pack columns, or a JSON file holding a list of {"source": ..., "pack": ...}.
+# A source is a local file path, an http(s) URL, or an s3://bucket/key URL
+# where a key ending in '/' or holding a glob ingests every matching object.
+def read_ingest_manifest(path):
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    entries = []
+    for number, row in enumerate(rows, start=1):
+        source, pack = (row.get('source') or '').strip(), (row.get('pack') or '').strip()
+        if not source or not pack:
+            raise ValueError(f"Entry {number} of {path} needs both a source and a pack")
+        entries.append((source, pack))
+    return entries
+
+# Chunks of a source for upload_to_pinecone, and the bytes it holds when known
+def open_source(source):
+    from load_data import load_file_chunks, load_s3_file_chunks, load_web
+
+    parts = urlsplit(source)
+    if parts.scheme in ('http', 'https'):
+        return load_web(source), None
+    if parts.scheme == 's3':
+        return load_s3_file_chunks(parts.netloc, parts.path.lstrip('/')), None
+    return load_file_chunks(source), os.path.getsize(source)
+
+# Upload every source of one pack, in order, in a worker process. A pack's
+# sources share its manifest, so they are never uploaded by two processes at
+# once. With state_dir, manifests and the upload journal are kept there
+# instead of in MANIFEST_DIR and JOURNAL_PATH. Returns one small report per
+# source; the full summaries stay here.
+def ingest_pack(pack, sources, username, upload_workers, text_columns=None, dedup_threshold=None, local_lambda=False,
+                state_dir=None):
+    from s3_ingest import ingest_s3_prefix, is_s3_pattern
+    from upload_data import upload_to_pinecone
+
+    lambda_client = None
+    if local_lambda:
+        from local_lambda import LocalLambda
+        lambda_client = LocalLambda(keep_records=False)
+
+    journal = None
+    if state_dir:
+        import manifest
+        from upload_journal import UploadJournal
+        manifest.MANIFEST_DIR = os.path.join(state_dir, 'manifests')
+        journal = UploadJournal(os.path.join(state_dir, 'uploads.sqlite3'))
+
+    reports = []
+    for source in sources:
+        start = time.perf_counter()
+        report = {"source": source, "pack": pack, "records": 0, "skipped": 0, "duplicates": 0, "deleted": 0,
+                  "failed_batches": 0, "bytes_read": 0, "bytes_sent": 0, "seconds": 0.0, "error": None}
+        options = {"max_workers": upload_workers, "text_columns": text_columns, "dedup_threshold": dedup_threshold,
+                   "journal": journal}
+        try:
+            parts = urlsplit(source)
+            if parts.scheme == 's3' and is_s3_pattern(parts.path.lstrip('/')):
+                summary = ingest_s3_prefix(parts.netloc, parts.path.lstrip('/'), pack, username,
+                                           lambda_client=lambda_client, **options)
+                size = summary['bytes_read']
+                if summary['failed_objects']:
+                    report['error'] = f"{len(summary['failed_objects'])} objects failed"
+            else:
+                data, size = open_source(source)
+                summary = upload_to_pinecone(data, pack, username, lambda_client=lambda_client, source=source, **options)
+            report.update(records=summary['records_sent'], skipped=summary['skipped'],
+                          duplicates=summary['duplicates'] + summary['near_duplicates'], deleted=summary['deleted'],
+                          failed_batches=len(summary['failed']), bytes_read=size or 0,
+                          bytes_sent=summary['bytes_sent'])
+        except Exception as e:
+            logging.error("Failed to ingest %s into pack %s: %s", source, pack, e)
+            report['error'] = str(e)
+        report['seconds'] = time.perf_counter() - start
+        reports.append(report)
+    return reports
+
+# Ingest manifest entries with one task per pack spread over a process pool,
+# so parsing and formatting run on every core. A trial run against the local
+# Lambda keeps its manifests and journal in a throwaway directory unless
+# state_dir is given, so it never makes a real run skip records. Returns the
+# per-source reports and the wall-clock seconds taken.
+def run_ingest(entries, username, processes=INGEST_PROCESSES, upload_workers=None, text_columns=None,
+               dedup_threshold=None, local_lambda=False, state_dir=None):
+    if local_lambda and state_dir is None:
+        with tempfile.TemporaryDirectory(prefix='packman-trial-') as trial_dir:
+            return run_ingest(entries, username, processes, upload_workers, text_columns, dedup_threshold,
+                              local_lambda, trial_dir)
+
+    from upload_data import UPLOAD_CONCURRENCY
+
+    packs = {}
+    for source, pack in entries:
+        packs.setdefault(pack, []).append(source)
+
+    start = time.perf_counter()
+    reports = []
+    with ProcessPoolExecutor(max_workers=max(1, min(processes, len(packs) or 1))) as executor:
+        futures = {executor.submit(ingest_pack, pack, sources, username, upload_workers or UPLOAD_CONCURRENCY,
+                                   text_columns, dedup_threshold, local_lambda, state_dir): pack
+                   for pack, sources in packs.items()}
+        for future in as_completed(futures):
+            pack_reports = future.result()
+            for report in pack_reports:
+                logging.info("Ingested %s into pack %s: %d records in %.1f seconds.", report['source'],
+                             report['pack'], report['records'], report['seconds'])
+            reports.extend(pack_reports)
+    return reports, time.perf_counter() - start
+
+def print_report(reports, seconds, out=sys.stdout):
+    print(f"{'pack':<24} {'source':<48} {'records':>10} {'skipped':>9} {'dupes':>9} {'failed':>7} {'seconds':>8}",
+          file=out)
+    for report in sorted(reports, key=lambda report: (report['pack'], report['source'])):
+        failed = 'error' if report['error'] else report['failed_batches']
+        print(f"{report['pack'][:24]:<24} {report['source'][-48:]:<48} {report['records']:>10,} "
+              f"{report['skipped']:>9,} {report['duplicates']:>9,} {failed:>7} {report['seconds']:>8.1f}", file=out)
+
+    records = sum(report['records'] for report in reports)
+    duplicates = sum(report['duplicates'] for report in reports)
+    read_mb = sum(report['bytes_read'] for report in reports) / (1024 * 1024)
+    sent_mb = sum(report['bytes_sent'] for report in reports) / (1024 * 1024)
+    print(file=out)
+    print(f"{len(reports)} sources into {len({report['pack'] for report in reports})} packs in {seconds:.1f} seconds: "
+          f"{records:,} records ({records / seconds if seconds else 0:,.0f}/s), {duplicates:,} duplicates dropped, "
+          f"{read_mb:,.1f} MB of files read ({read_mb / seconds if seconds else 0:,.1f} MB/s), "
+          f"{sent_mb:,.1f} MB sent.", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load, format and upload sources to packs without the web app.")
+    parser.add_argument('manifest', help="CSV (source,pack columns) or JSON list of sources and their packs")
+    parser.add_argument('--username', default=os.getenv('PACKMAN_USERNAME'),
+                        help="owner of the packs (default: $PACKMAN_USERNAME)")
+    parser.add_argument('--processes', type=int, default=INGEST_PROCESSES, help="worker processes")
+    parser.add_argument('--upload-workers', type=int, default=None, help="concurrent uploads per process")
+    parser.add_argument('--text-columns', nargs='+', default=None, help="CSV columns to embed (default: all)")
+    parser.add_argument('--dedup', nargs='?', type=float, const=DEDUP_THRESHOLD, default=None, metavar='THRESHOLD',
+                        help=f"drop near-duplicate chunks at this similarity (default {DEDUP_THRESHOLD})")
+    parser.add_argument('--local-lambda', action='store_true',
+                        help="send batches to an in-process stand-in instead of AWS, for trial runs; manifests and "
+                             "the upload journal go to a throwaway directory unless --state-dir is given")
+    parser.add_argument('--state-dir', default=None,
+                        help="keep manifests and the upload journal here instead of MANIFEST_DIR and JOURNAL_PATH")
+    args = parser.parse_args(argv)
+
+    if not args.username:
+        parser.error("a username is required (--username or $PACKMAN_USERNAME)")
+    try:
+        entries = read_ingest_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read {args.manifest}: {e}")
+
+    reports, seconds = run_ingest(entries, args.username, args.processes, args.upload_workers, args.text_columns,
+                                  args.dedup, args.local_lambda, args.state_dir)
+    print_report(reports, seconds)
+    return 1 if any(report['error'] or report['failed_batches'] for report in reports) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
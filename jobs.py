@@ -0,0 +1,128 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Background worker threads shared by all sessions of the process
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+
+# Seconds finished jobs stay visible before they are forgotten
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', '3600'))
+
+# Runs long tasks such as uploads on background worker threads, outside the
+# Streamlit script run, so they survive reruns and closed tabs. Jobs are
+# queued, get an id, and report their state and progress for polling.
+class JobRunner:
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.workers = max(1, workers)
+        self.retention = retention
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        # Called with the lock held; threads start on first use
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads) + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _prune(self):
+        # Called with the lock held
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] is not None and job['finished_at'] < cutoff]:
+            del self._jobs[job_id]
+
+    # Queue function(*args, progress=<callback>, **kwargs) and return its job id.
+    # The callback takes a dict of progress fields to merge into the job status.
+    def submit(self, kind, function, *args, owner=None, description='', **kwargs):
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "owner": owner,
+            "description": description,
+            "state": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "_order": next(self._order),
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+            self._start_workers()
+        self._queue.put((job_id, function, args, kwargs))
+        logging.info("Queued %s job %s: %s", kind, job_id, description)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _work(self):
+        while True:
+            job_id, function, args, kwargs = self._queue.get()
+            self._update(job_id, state="running", started_at=time.time())
+
+            def progress(fields, job_id=job_id):
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                    if job is not None:
+                        job['progress'].update(fields)
+
+            try:
+                result = function(*args, progress=progress, **kwargs)
+                self._update(job_id, state="succeeded", result=result, finished_at=time.time())
+                logging.info("Job %s finished.", job_id)
+            except Exception as e:
+                logging.error("Job %s failed: %s", job_id, e)
+                self._update(job_id, state="failed", error=str(e), finished_at=time.time())
+            finally:
+                self._queue.task_done()
+
+    # Snapshot of a job's status, or None if it is unknown or was pruned
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _snapshot(job) if job is not None else None
+
+    # Snapshots of the jobs submitted by owner, oldest first
+    def list_jobs(self, owner=None):
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or job['owner'] == owner]
+            return [_snapshot(job) for job in sorted(jobs, key=lambda job: job['_order'])]
+
+    # Block until every queued job has finished (for scripts and tests)
+    def wait(self):
+        self._queue.join()
+
+def _snapshot(job):
+    snapshot = {key: value for key, value in job.items() if not key.startswith('_')}
+    snapshot['progress'] = dict(job['progress'])
+    return snapshot
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+# Job runner shared by every session in this process
+def get_job_runner():
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner()
+        return _default_runner
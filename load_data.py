@@ -1,67 +1,486 @@
+import csv
+import json
 import logging
-from langchain_community.document_loaders import WebBaseLoader
-import boto3
+import io
 import os
-from botocore.exceptions import NoCredentialsError, ClientError
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import requests
+from chunking import get_chunker
+from metrics import get_metrics
+from web_cache import get_web_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# pyarrow, boto3 and BeautifulSoup are imported where they are used, so the
+# app starts without them and pays for each only when a loader needs it
+
+# Request headers for web pages, as langchain's WebBaseLoader sends them
+WEB_HEADERS = {
+    'User-Agent': os.getenv('USER_AGENT', 'DefaultLangchainUserAgent'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Default chunking for web pages and text files, and how long to wait for pages.
+# Sizes count characters, or approximate tokens when TEXT_CHUNK_UNIT is 'tokens'.
+TEXT_CHUNK_SIZE = int(os.getenv('TEXT_CHUNK_SIZE', '1000'))
+TEXT_CHUNK_OVERLAP = int(os.getenv('TEXT_CHUNK_OVERLAP', '200'))
+TEXT_CHUNK_UNIT = os.getenv('TEXT_CHUNK_UNIT', 'chars')
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '30'))
+
+# Rows per DataFrame chunk when streaming CSV files
+CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', '50000'))
+
+# Uploaded files larger than this many bytes are streamed in chunks rather than loaded whole
+LOCAL_STREAM_THRESHOLD = int(os.getenv('LOCAL_STREAM_THRESHOLD', str(100 * 1024 * 1024)))
+
+# Characters read per block when streaming text files, and strings per yielded
+# chunk when streaming text-like files into the upload pipeline
+TEXT_READ_BLOCK = int(os.getenv('TEXT_READ_BLOCK', str(1024 * 1024)))
+TEXT_CHUNKS_PER_BATCH = 1000
+
 # Load CSV
 def load_csv(file_paths):
-    logging.info("Loading CSV from file path: %s", file_paths[0])
-    data = pd.read_csv(file_paths[0])
+    logging.info("Loading CSV from file path: %s", _describe(file_paths[0]))
+    data = pd.read_csv(_csv_source(file_paths[0]))
     logging.info("CSV loaded into DataFrame successfully.")
     return data
 
-# Load web
-def load_web(url):
-    logging.info("Loading web content from URL: %s", url)
-    loader_web = WebBaseLoader(url)
-    documents = loader_web.load()
-    logging.info("Web content loaded successfully.")
-
-    # Extract text from the loaded documents
-    text = documents[0].page_content
-
-    # Split the text into smaller chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,  # Adjust chunk size as needed
-        chunk_overlap=200,
-    )
-    texts = text_splitter.split_text(text)
+# Load CSV in chunks, yielding one DataFrame of at most chunksize rows at a time
+def load_csv_chunks(file_paths, chunksize=CSV_CHUNK_ROWS):
+    logging.info("Streaming CSV from file path: %s in chunks of %d rows", _describe(file_paths[0]), chunksize)
+    with pd.read_csv(_csv_source(file_paths[0]), chunksize=chunksize) as reader:
+        for chunk_number, chunk in enumerate(reader, start=1):
+            logging.info("Read CSV chunk %d with %d rows.", chunk_number, len(chunk))
+            yield chunk
+
+# Fetch a web page and extract its text the way WebBaseLoader does. Sends the
+# cached validators so an unchanged page comes back as 304 with no body, in
+# which case None is returned in place of the text.
+def fetch_web_text(url, etag=None, last_modified=None):
+    from bs4 import BeautifulSoup
+
+    headers = dict(WEB_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = requests.get(url, headers=headers, timeout=WEB_TIMEOUT)
+    if response.status_code == 304:
+        return None, response
+    response.encoding = response.apparent_encoding
+    soup = BeautifulSoup(response.text, 'xml' if url.endswith('.xml') else 'html.parser')
+    return soup.get_text(), response
+
+# Split text into overlapping chunks
+def split_text(text, chunk_size=TEXT_CHUNK_SIZE, chunk_overlap=TEXT_CHUNK_OVERLAP, markdown=False,
+               unit=TEXT_CHUNK_UNIT):
+    return get_chunker(chunk_size, chunk_overlap, unit, markdown).split(text)
+
+# Load web page content
+def load_web(url, chunk_size=TEXT_CHUNK_SIZE, chunk_overlap=TEXT_CHUNK_OVERLAP, cache=None, unit=TEXT_CHUNK_UNIT):
+    with get_metrics().timer('stage_seconds', stage='load', source='web'):
+        logging.info("Loading web content from URL: %s", url)
+        cache = cache or get_web_cache()
+        chunker = get_chunker(chunk_size, chunk_overlap, unit)
+        settings = chunker.settings
+
+        # Serve a recently checked page straight from the cache, otherwise revalidate it
+        page = cache.get_page(url)
+        if page is not None and cache.is_fresh(page):
+            logging.info("Web content served from cache.")
+        else:
+            text, response = fetch_web_text(
+                url,
+                etag=page['etag'] if page else None,
+                last_modified=page['last_modified'] if page else None,
+            )
+            if text is None and page is not None:
+                logging.info("Web content not modified; using cached copy.")
+                cache.mark_validated(url, page)
+            elif response.status_code == 200:
+                logging.info("Web content loaded successfully.")
+                page = cache.put_page(url, text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            else:
+                # Error pages are returned as before but never cached
+                logging.warning("Web content returned status %d; not caching it.", response.status_code)
+                texts = chunker.split(text or '')
+                logging.info("Text split into %d chunks.", len(texts))
+                return texts
+
+        texts = cache.get_chunks(url, page['digest'], settings)
+        if texts is None:
+            # Split the text into smaller chunks
+            texts = chunker.split(page['text'])
+            cache.put_chunks(url, page['digest'], settings, texts)
+        logging.info("Text split into %d chunks.", len(texts))
+
+        return texts
+
+
+# Objects at least this large are fetched with parallel byte-range GETs
+S3_RANGE_THRESHOLD = int(os.getenv('S3_RANGE_THRESHOLD', str(64 * 1024 * 1024)))
+
+# Size of each byte-range GET and how many run at once
+S3_RANGE_PART_SIZE = int(os.getenv('S3_RANGE_PART_SIZE', str(8 * 1024 * 1024)))
+S3_RANGE_CONCURRENCY = int(os.getenv('S3_RANGE_CONCURRENCY', '8'))
+
+# Keep-alive connections the shared S3 client holds open
+S3_POOL_SIZE = int(os.getenv('S3_POOL_SIZE', '32'))
+
+# Read-only file object over a memoryview, so pandas can parse the buffer in place
+class MemoryviewReader(io.RawIOBase):
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+_default_s3_client = None
+_default_s3_client_lock = threading.Lock()
+
+# S3 client shared by every session in this process; boto3 clients are
+# thread-safe. Its connection pool is sized for parallel range and object GETs.
+def get_s3_client():
+    global _default_s3_client
+    with _default_s3_client_lock:
+        if _default_s3_client is None:
+            import boto3
+            from botocore.config import Config
+
+            _default_s3_client = boto3.client('s3', config=Config(max_pool_connections=S3_POOL_SIZE))
+        return _default_s3_client
+
+# Fetch one byte range of an S3 object straight into its slice of the buffer
+def _fetch_s3_range(s3, bucket_name, file_name, etag, view, start, end):
+    response = s3.get_object(Bucket=bucket_name, Key=file_name, Range=f"bytes={start}-{end}", IfMatch=etag)
+    position = start
+    for piece in response['Body'].iter_chunks(1024 * 1024):
+        view[position:position + len(piece)] = piece
+        position += len(piece)
+    if position != end + 1:
+        raise IOError(f"Short read for bytes {start}-{end} of s3://{bucket_name}/{file_name}")
+
+# Fetch an S3 object into memory: a small object with one GET as bytes, a
+# large one with parallel byte-range GETs into a buffer of its own, returned
+# as a memoryview that the loaders parse in place. Every GET is pinned to one
+# version of the object: the etag given, e.g. as listed, or else the one a
+# HEAD request finds. Passing the size too skips the HEAD request.
+def read_s3_object(bucket_name, file_name, s3_client=None, etag=None, size=None):
+    s3 = s3_client or get_s3_client()
+    if etag is None or size is None:
+        head = s3.head_object(Bucket=bucket_name, Key=file_name, **({'IfMatch': etag} if etag else {}))
+        etag, size = head['ETag'], head['ContentLength']
+    if size < S3_RANGE_THRESHOLD:
+        return s3.get_object(Bucket=bucket_name, Key=file_name, IfMatch=etag)['Body'].read()
+
+    logging.info("Fetching %d bytes from S3 in %d-byte ranges.", size, S3_RANGE_PART_SIZE)
+    # Each object gets its own buffer, so readers of earlier objects stay valid
+    view = memoryview(bytearray(size))
+    ranges = [(start, min(start + S3_RANGE_PART_SIZE, size) - 1) for start in range(0, size, S3_RANGE_PART_SIZE)]
+    with ThreadPoolExecutor(max_workers=max(1, S3_RANGE_CONCURRENCY)) as executor:
+        futures = [executor.submit(_fetch_s3_range, s3, bucket_name, file_name, etag, view, start, end)
+                   for start, end in ranges]
+        for future in futures:
+            future.result()
+    return view
+
+# Open an S3 object as a file object without writing it to disk. Small objects
+# stream from the get_object body; large ones are read with read_s3_object.
+def open_s3_object(bucket_name, file_name, s3_client=None, etag=None, size=None):
+    s3 = s3_client or get_s3_client()
+    if etag is None or size is None:
+        head = s3.head_object(Bucket=bucket_name, Key=file_name, **({'IfMatch': etag} if etag else {}))
+        etag, size = head['ETag'], head['ContentLength']
+    if size < S3_RANGE_THRESHOLD:
+        return s3.get_object(Bucket=bucket_name, Key=file_name, IfMatch=etag)['Body']
+    return io.BufferedReader(MemoryviewReader(read_s3_object(bucket_name, file_name, s3, etag, size)))
+
+# Load S3 file
+def load_s3_file(bucket_name, file_name, s3_client=None):
+    from botocore.exceptions import ClientError, NoCredentialsError
+
+    with get_metrics().timer('stage_seconds', stage='load', source='s3'):
+        logging.info("Loading file from S3 bucket: %s, file: %s", bucket_name, file_name)
+        try:
+            # Parse the object straight from S3, without a temporary file
+            data = pd.read_csv(open_s3_object(bucket_name, file_name, s3_client))
+            logging.info("File read into DataFrame successfully.")
+            return data
+        except NoCredentialsError:
+            logging.error("AWS credentials not found.")
+            get_metrics().increment('load_failures_total', source='s3')
+            return None
+        except ClientError as e:
+            logging.error("Error downloading file: %s", e)
+            get_metrics().increment('load_failures_total', source='s3')
+            return None
+        except Exception as e:
+            logging.error("Error reading file into DataFrame: %s", e)
+            get_metrics().increment('load_failures_total', source='s3')
+            return None
+
+# Load S3 file in chunks, yielding one DataFrame of at most chunksize rows at a time
+def load_s3_file_chunks(bucket_name, file_name, chunksize=CSV_CHUNK_ROWS, s3_client=None):
+    logging.info("Streaming file from S3 bucket: %s, file: %s in chunks of %d rows", bucket_name, file_name, chunksize)
+    with pd.read_csv(open_s3_object(bucket_name, file_name, s3_client), chunksize=chunksize) as reader:
+        for chunk_number, chunk in enumerate(reader, start=1):
+            logging.info("Read S3 chunk %d with %d rows.", chunk_number, len(chunk))
+            yield chunk
+
+# Local file loaders take either a path or the file's bytes already in memory
+# (bytes, bytearray or memoryview, e.g. an uploaded file's getbuffer()). Bytes
+# are parsed in place through MemoryviewReader or an Arrow buffer, without a
+# copy or a temporary file.
+def _is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+def _describe(source):
+    return f"<{memoryview(source).nbytes}-byte buffer>" if _is_buffer(source) else source
+
+def _open_binary(source):
+    if _is_buffer(source):
+        return io.BufferedReader(MemoryviewReader(memoryview(source).cast('B')))
+    return open(source, 'rb')
+
+def _open_text(source, errors='strict'):
+    if _is_buffer(source):
+        return io.TextIOWrapper(_open_binary(source), encoding='utf-8', errors=errors)
+    return open(source, 'r', encoding='utf-8', errors=errors)
+
+def _csv_source(source):
+    return _open_binary(source) if _is_buffer(source) else source
+
+def _arrow_source(source):
+    import pyarrow as pa
+
+    return pa.BufferReader(pa.py_buffer(source)) if _is_buffer(source) else source
+
+# Stream a text or Markdown file as chunks without reading it all at once
+def iter_text_chunks(file_path, chunk_size=TEXT_CHUNK_SIZE, chunk_overlap=TEXT_CHUNK_OVERLAP, markdown=False,
+                     block_size=TEXT_READ_BLOCK, unit=TEXT_CHUNK_UNIT):
+    chunker = get_chunker(chunk_size, chunk_overlap, unit, markdown)
+    with _open_text(file_path, errors='replace') as f:
+        yield from chunker.iter_chunks(iter(lambda: f.read(block_size), ''))
+
+# Load a text file as chunks
+def load_text(file_path, chunk_size=TEXT_CHUNK_SIZE, chunk_overlap=TEXT_CHUNK_OVERLAP, markdown=False):
+    logging.info("Loading text from file path: %s", _describe(file_path))
+    texts = list(iter_text_chunks(file_path, chunk_size, chunk_overlap, markdown))
     logging.info("Text split into %d chunks.", len(texts))
+    return texts
+
+# Text of one JSON Lines value: the text field of an object if it has one,
+# otherwise all of its values joined like a CSV row
+def _jsonl_text(value, text_field):
+    if isinstance(value, dict):
+        if text_field in value:
+            return str(value[text_field])
+        return ' '.join(str(item) for item in value.values())
+    return value if isinstance(value, str) else json.dumps(value)
+
+# Stream the texts of a JSON Lines file, one line at a time
+def iter_jsonl_texts(file_path, text_field='text'):
+    with _open_text(file_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                logging.warning("Skipping invalid JSON on line %d of %s: %s", line_number, _describe(file_path), e)
+                continue
+            yield _jsonl_text(value, text_field)
 
+# Load JSON Lines file
+def load_jsonl(file_path, text_field='text'):
+    logging.info("Loading JSON Lines from file path: %s", _describe(file_path))
+    texts = list(iter_jsonl_texts(file_path, text_field))
+    logging.info("Loaded %d JSON Lines records.", len(texts))
     return texts
 
+# Load Parquet file, reading only the requested columns from a memory map
+def load_parquet(file_path, columns=None):
+    import pyarrow.parquet as pq
 
-# Load S3 file
-def load_s3_file(bucket_name, file_name):
-    logging.info("Loading file from S3 bucket: %s, file: %s", bucket_name, file_name)
-    s3 = boto3.client('s3')
-    temp_file_path = f"temp_{file_name}"
+    logging.info("Loading Parquet from file path: %s", _describe(file_path))
+    data = pq.read_table(_arrow_source(file_path), columns=columns, memory_map=not _is_buffer(file_path)).to_pandas()
+    logging.info("Parquet loaded into DataFrame successfully.")
+    return data
+
+# Stream a Parquet file as DataFrames of at most batch_rows rows
+def iter_parquet_chunks(file_path, columns=None, batch_rows=CSV_CHUNK_ROWS):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(_arrow_source(file_path), memory_map=not _is_buffer(file_path))
+    offset = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        chunk = batch.to_pandas()
+        # Continue the row numbering across chunks, like read_csv chunks do
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+# Load Feather file, reading only the requested columns from a memory map
+def load_feather(file_path, columns=None):
+    import pyarrow.feather as feather
+
+    logging.info("Loading Feather from file path: %s", _describe(file_path))
+    data = feather.read_table(_arrow_source(file_path), columns=columns, memory_map=not _is_buffer(file_path)).to_pandas()
+    logging.info("Feather loaded into DataFrame successfully.")
+    return data
+
+# Stream a Feather (Arrow IPC) file one record batch at a time
+def iter_feather_chunks(file_path, columns=None):
+    import pyarrow as pa
+
+    with (pa.BufferReader(pa.py_buffer(file_path)) if _is_buffer(file_path) else pa.memory_map(file_path)) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+        except pa.ArrowInvalid:
+            # Feather version 1 files are not Arrow IPC files; read them whole
+            yield load_feather(file_path, columns)
+            return
+        offset = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns:
+                batch = batch.select(columns)
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+# Group a stream of strings into lists for the upload pipeline
+def _group_texts(texts, size=TEXT_CHUNKS_PER_BATCH):
+    group = []
+    for text in texts:
+        group.append(text)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+# Local file formats by name: the extensions they use, a loader returning the
+# whole file, and a streaming reader yielding DataFrames or lists of strings.
+# Both take the file path and keyword options; options a format does not use
+# are ignored.
+FILE_FORMATS = {}
+
+def register_format(name, extensions, load, iter_chunks):
+    FILE_FORMATS[name] = {"extensions": tuple(extensions), "load": load, "iter_chunks": iter_chunks}
+
+register_format(
+    'csv', ('.csv',),
+    lambda path, **options: load_csv([path]),
+    lambda path, **options: load_csv_chunks([path], options.get('chunksize', CSV_CHUNK_ROWS)),
+)
+register_format(
+    'text', ('.txt', '.text', '.log'),
+    lambda path, **options: load_text(path, options.get('chunk_size', TEXT_CHUNK_SIZE), options.get('chunk_overlap', TEXT_CHUNK_OVERLAP)),
+    lambda path, **options: _group_texts(iter_text_chunks(path, options.get('chunk_size', TEXT_CHUNK_SIZE), options.get('chunk_overlap', TEXT_CHUNK_OVERLAP))),
+)
+register_format(
+    'markdown', ('.md', '.markdown'),
+    lambda path, **options: load_text(path, options.get('chunk_size', TEXT_CHUNK_SIZE), options.get('chunk_overlap', TEXT_CHUNK_OVERLAP), markdown=True),
+    lambda path, **options: _group_texts(iter_text_chunks(path, options.get('chunk_size', TEXT_CHUNK_SIZE), options.get('chunk_overlap', TEXT_CHUNK_OVERLAP), markdown=True)),
+)
+register_format(
+    'jsonl', ('.jsonl', '.ndjson'),
+    lambda path, **options: load_jsonl(path, options.get('text_field', 'text')),
+    lambda path, **options: _group_texts(iter_jsonl_texts(path, options.get('text_field', 'text'))),
+)
+register_format(
+    'parquet', ('.parquet', '.pq'),
+    lambda path, **options: load_parquet(path, options.get('columns')),
+    lambda path, **options: iter_parquet_chunks(path, options.get('columns'), options.get('chunksize', CSV_CHUNK_ROWS)),
+)
+register_format(
+    'feather', ('.feather', '.arrow'),
+    lambda path, **options: load_feather(path, options.get('columns')),
+    lambda path, **options: iter_feather_chunks(path, options.get('columns')),
+)
+
+# Whether the complete rows of a sample all split into the same number of
+# fields, more than one, with a sniffed CSV dialect. A sample cut off mid-row
+# leaves its last row out.
+def _consistent_rows(text, dialect, max_rows=20):
+    rows = [row for row in csv.reader(io.StringIO(text), dialect) if row]
+    if not text.endswith('\n'):
+        rows = rows[:-1]
+    rows = rows[:max_rows]
+    return len(rows) >= 2 and len(rows[0]) > 1 and all(len(row) == len(rows[0]) for row in rows)
+
+# Guess a file format from the first bytes of the file. Text counts as CSV
+# when it has a header row, or when its rows split evenly into columns, as
+# CSV files whose every column is text do.
+def sniff_format(head):
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    if head.startswith(b'ARROW1'):
+        return 'feather'
+    text = head.decode('utf-8', errors='ignore')
+    first_line = text.split('\n', 1)[0].strip()
+    if first_line.startswith('{'):
+        try:
+            json.loads(first_line)
+            return 'jsonl'
+        except ValueError:
+            pass
     try:
-        # Download the file from S3 to a temporary location
-        s3.download_file(bucket_name, file_name, temp_file_path)
-        logging.info("File downloaded successfully from S3.")
-
-        # Read the file into a DataFrame
-        data = pd.read_csv(temp_file_path)
-        logging.info("File read into DataFrame successfully.")
-        return data
-    except NoCredentialsError:
-        logging.error("AWS credentials not found.")
-        return None
-    except ClientError as e:
-        logging.error("Error downloading file: %s", e)
-        return None
-    except Exception as e:
-        logging.error("Error reading file into DataFrame: %s", e)
-        return None
-    finally:
-        # Remove the temporary file if it exists
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logging.info("Temporary file removed.")
+        sniffer = csv.Sniffer()
+        dialect = sniffer.sniff(text, delimiters=',;\t|')
+        if sniffer.has_header(text) or _consistent_rows(text, dialect):
+            return 'csv'
+    except csv.Error:
+        pass
+    return 'text'
+
+# Pick the format for a file from its extension, or by sniffing its contents.
+# file_name gives the original name when file_path is a copy or in-memory bytes.
+def detect_format(file_path, file_name=None):
+    extension = os.path.splitext(file_name or ('' if _is_buffer(file_path) else file_path))[1].lower()
+    for name, spec in FILE_FORMATS.items():
+        if extension in spec['extensions']:
+            return name
+    if _is_buffer(file_path):
+        return sniff_format(bytes(memoryview(file_path).cast('B')[:64 * 1024]))
+    with open(file_path, 'rb') as f:
+        head = f.read(64 * 1024)
+    return sniff_format(head)
+
+# Load a local file with the fastest reader for its format
+def load_file(file_path, file_format=None, file_name=None, **options):
+    file_format = file_format or detect_format(file_path, file_name)
+    logging.info("Loading %s as %s.", file_name or _describe(file_path), file_format)
+    with get_metrics().timer('stage_seconds', stage='load', source='file'):
+        return FILE_FORMATS[file_format]['load'](file_path, **options)
+
+# Stream a local file as DataFrames or lists of strings for upload_to_pinecone
+def load_file_chunks(file_path, file_format=None, file_name=None, **options):
+    file_format = file_format or detect_format(file_path, file_name)
+    logging.info("Streaming %s as %s.", file_name or _describe(file_path), file_format)
+    return FILE_FORMATS[file_format]['iter_chunks'](file_path, **options)
+
+# Load an uploaded file from its bytes: whole when it is small, or as a stream
+# of chunks for upload_to_pinecone when it is larger than LOCAL_STREAM_THRESHOLD
+def load_buffer(buffer, file_name=None, file_format=None, **options):
+    if memoryview(buffer).nbytes > LOCAL_STREAM_THRESHOLD:
+        return load_file_chunks(buffer, file_format, file_name, **options)
+    return load_file(buffer, file_format, file_name, **options)
@@ -0,0 +1,80 @@
+import io
+import json
+import threading
+import time
+from wire_format import WIRE_FORMAT_VERSION, WireFormatError, decode_ids, decode_records
+
+# In-process stand-in for the pinecone-embedding Lambda, for exercising the
+# upload path without AWS. It implements the client's invoke() call, decodes
+# both the plain JSON and the compact wire format, and keeps the uploaded
+# records in memory per (username, pack_name). Pass wire_versions=() to behave
+# like a Lambda that predates the compact format. latency adds that many
+# seconds to every call, and keep_records=False only counts uploaded records,
+# for benchmarks that should not hold them all in memory.
+class LocalLambda:
+    def __init__(self, wire_versions=(WIRE_FORMAT_VERSION,), latency=0.0, keep_records=True):
+        self.wire_versions = list(wire_versions)
+        self.latency = latency
+        self.keep_records = keep_records
+        self.records_received = 0
+        self.packs = {}
+        self.invocations = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b''):
+        if isinstance(Payload, str):
+            Payload = Payload.encode('utf-8')
+        with self._lock:
+            self.invocations += 1
+            self.bytes_received += len(Payload)
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            result = self.handle(json.loads(Payload)['body'])
+        except (KeyError, ValueError) as e:
+            result = {"errorMessage": f"{type(e).__name__}: {e}", "errorType": type(e).__name__}
+
+        if InvocationType == 'Event':
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result).encode('utf-8'))}
+
+    def handle(self, body):
+        action = body['action']
+        if action == 'capabilities':
+            if not self.wire_versions:
+                return {"errorMessage": f"Unknown action: {action}"}
+            return {"statusCode": 200, "wire_versions": self.wire_versions}
+
+        if ('data_packed' in body or 'ids_packed' in body) and \
+                body.get('encoding', {}).get('version') not in self.wire_versions:
+            raise WireFormatError("Compact payloads are not supported")
+
+        key = (body['username'], body['pack_name'])
+        with self._lock:
+            if action == 'create_pack':
+                records = decode_records(body)
+                self.records_received += len(records)
+                if self.keep_records:
+                    self.packs.setdefault(key, {}).update((record['id'], record['text']) for record in records)
+                else:
+                    self.packs.setdefault(key, {})
+                return {"statusCode": 200, "body": f"Upserted {len(records)} records"}
+            if action == 'delete_records':
+                ids = decode_ids(body)
+                pack = self.packs.get(key, {})
+                for id_ in ids:
+                    pack.pop(id_, None)
+                return {"statusCode": 200, "body": f"Deleted {len(ids)} records"}
+            if action == 'delete_pack':
+                if key not in self.packs:
+                    return {"errorMessage": f"Index {body['pack_name']} does not exist"}
+                del self.packs[key]
+                return {"statusCode": 200, "body": f"Deleted pack {body['pack_name']}"}
+        return {"errorMessage": f"Unknown action: {action}"}
+
+    # Records currently stored for a pack, as {id: text}
+    def records(self, username, pack_name):
+        with self._lock:
+            return dict(self.packs.get((username, pack_name), {}))
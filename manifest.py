@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Where the per-pack manifests of uploaded record ids are kept
+MANIFEST_DIR = os.getenv('MANIFEST_DIR', os.path.join(os.path.expanduser('~'), '.packman', 'manifests'))
+
+_manifest_lock = threading.Lock()
+_pack_locks = {}
+
+def _manifest_path(username, pack_name):
+    digest = hashlib.sha256(f"{username}\0{pack_name}".encode('utf-8')).hexdigest()
+    return os.path.join(MANIFEST_DIR, f"{digest}.json")
+
+# The lock an upload holds from loading a pack's manifest until it saves it
+# again, so uploads to the same pack take turns instead of overwriting each
+# other's sources
+def pack_lock(username, pack_name):
+    with _manifest_lock:
+        return _pack_locks.setdefault((username, pack_name), threading.Lock())
+
+# Load the manifest of record ids already uploaded to a pack, grouped by source
+def load_manifest(username, pack_name):
+    path = _manifest_path(username, pack_name)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        # A pack without a manifest may predate content ids and still hold
+        # vec1, vec2, ... ids from the uploads of any source
+        return {"username": username, "pack_name": pack_name, "sources": {}, "legacy": True}
+    except (OSError, ValueError) as e:
+        # A damaged manifest only costs a full re-upload, never lost data
+        logging.warning("Ignoring unreadable manifest for pack %s: %s", pack_name, e)
+        return {"username": username, "pack_name": pack_name, "sources": {}}
+    return manifest
+
+def save_manifest(manifest):
+    path = _manifest_path(manifest['username'], manifest['pack_name'])
+    with _manifest_lock:
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves half a manifest
+        fd, temp_path = tempfile.mkstemp(dir=MANIFEST_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, path)
+
+# Start the manifest of a newly created pack, which holds no legacy ids
+def start_manifest(username, pack_name):
+    save_manifest({"username": username, "pack_name": pack_name, "sources": {}})
+
+# Forget everything uploaded to a pack, e.g. after the pack is deleted
+def delete_manifest(username, pack_name):
+    path = _manifest_path(username, pack_name)
+    with pack_lock(username, pack_name), _manifest_lock:
+        if os.path.exists(path):
+            os.remove(path)
+
+# All record ids uploaded to the pack, from any source
+def uploaded_ids(manifest):
+    ids = set()
+    for source_ids in manifest['sources'].values():
+        ids.update(source_ids)
+    return ids
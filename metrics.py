@@ -0,0 +1,204 @@
+import bisect
+import contextlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Serve metrics on 127.0.0.1 at this port (/metrics and /metrics.json); 0 disables it
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Write metrics to this file after every upload; .json files get JSON, others Prometheus text
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+
+# Log one in this many sampled debug messages, such as per-chunk payload dumps
+DEBUG_SAMPLE_EVERY = int(os.getenv('DEBUG_SAMPLE_EVERY', '100'))
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_PREFIX = 'packman_'
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+# Process-wide counters and latency histograms. Recording is a dict update
+# under a lock, cheap enough for per-batch and per-chunk use. timer() measures
+# exclusive time: a timer running inside another on the same thread is
+# subtracted from the outer one, so nested pipeline stages (pulling a chunk
+# from the loader while building a batch) are not counted twice.
+class Metrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._stack = threading.local()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram['buckets'][index] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        stack = getattr(self._stack, 'frames', None)
+        if stack is None:
+            stack = self._stack.frames = []
+        frame = [0.0]
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.observe(name, elapsed - frame[0], **labels)
+
+    # Iterate items, timing each step of the underlying iterator as a stage
+    def timed_iter(self, iterable, name, **labels):
+        iterator = iter(iterable)
+        while True:
+            with self.timer(name, **labels):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(key), "value": value}
+                        for (name, key), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(key), "count": histogram['count'], "sum": histogram['sum'],
+                           "buckets": dict(zip(map(str, self.buckets), itertools.accumulate(histogram['buckets'])))}
+                          for (name, key), histogram in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    # Metrics in the Prometheus text exposition format
+    def to_prometheus(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(value, buckets=list(value['buckets'])))
+                                for key, value in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, key), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {_PREFIX}{name} counter")
+                typed.add(name)
+            lines.append(f"{_PREFIX}{name}{_format_labels(key)} {value}")
+        for (name, key), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {_PREFIX}{name} histogram")
+                typed.add(name)
+            for bound, count in zip(self.buckets, itertools.accumulate(histogram['buckets'])):
+                lines.append(f"{_PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{_PREFIX}{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{_PREFIX}{name}_sum{_format_labels(key)} {histogram['sum']}")
+            lines.append(f"{_PREFIX}{name}_count{_format_labels(key)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    # Write the metrics to path atomically, as JSON for .json files and
+    # Prometheus text otherwise (e.g. for the node exporter textfile collector)
+    def write(self, path):
+        content = json.dumps(self.snapshot()) if path.endswith('.json') else self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    # Serve /metrics (Prometheus text) and /metrics.json on a local port
+    def serve(self, port, host='127.0.0.1'):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logging.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+        return server
+
+    # Write METRICS_FILE if one is configured
+    def flush(self):
+        if METRICS_FILE:
+            try:
+                self.write(METRICS_FILE)
+            except OSError as e:
+                logging.warning("Could not write metrics to %s: %s", METRICS_FILE, e)
+
+_END = object()
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+# Metrics shared by the whole process; starts the endpoint when METRICS_PORT is set
+def get_metrics():
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+            if METRICS_PORT:
+                try:
+                    _default_metrics.serve(METRICS_PORT)
+                except OSError as e:
+                    logging.warning("Could not serve metrics on port %d: %s", METRICS_PORT, e)
+        return _default_metrics
+
+_sample_counts = {}
+
+# Debug logging for messages that repeat per chunk or per record: only every
+# DEBUG_SAMPLE_EVERY-th message under key is logged, and nothing is formatted
+# unless debug logging is on, so log volume no longer grows with the data
+def debug_sampled(key, message, *args):
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    count = _sample_counts.get(key, 0)
+    _sample_counts[key] = count + 1
+    if count % max(1, DEBUG_SAMPLE_EVERY) == 0:
+        logging.debug("[sampled 1/%d] " + message, DEBUG_SAMPLE_EVERY, *args)
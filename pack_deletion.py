@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import api_client
+from manifest import delete_manifest
+from metrics import get_metrics
+from upload_data import backoff_delay, get_lambda_client, invoke_with_retry
+from upload_journal import get_upload_journal
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Packs deleted at once by a bulk delete
+DELETE_CONCURRENCY = int(os.getenv('DELETE_CONCURRENCY', '8'))
+
+# Retries of a pack deletion the API answered with a server error or throttling
+DELETE_API_RETRIES = int(os.getenv('DELETE_API_RETRIES', '3'))
+
+# Delete a pack's vectors through the Lambda. A pack that no longer exists
+# there counts as deleted. Returns None on success, or the error.
+def delete_pack_vectors(lambda_client, username, pack_name):
+    payload = json.dumps({"body": {"action": "delete_pack", "username": username, "pack_name": pack_name}})
+    try:
+        response_payload = invoke_with_retry(lambda_client, payload, f"delete of pack {pack_name}")
+    except Exception as e:
+        return str(e)
+    error = response_payload.get('errorMessage')
+    if error is not None and "does not exist" not in error:
+        return error
+    logging.info("Deleted vectors of pack %s: %s", pack_name, response_payload)
+    return None
+
+# Delete a pack through the API, retrying server errors, throttling and
+# connection failures. A pack the API no longer knows counts as deleted.
+# Returns None on success, or the error.
+def delete_pack_record(access_token, pack_id, max_retries=DELETE_API_RETRIES):
+    attempt = 0
+    while True:
+        try:
+            response = api_client.delete_pack(access_token, pack_id)
+            if response.status_code in [200, 204, 404]:
+                return None
+            error = f"API responded with {response.status_code}: {response.text}"
+            retryable = response.status_code == 429 or response.status_code >= 500
+        except requests.RequestException as e:
+            error, retryable = str(e), True
+        if attempt >= max_retries or not retryable:
+            return error
+        delay = backoff_delay(attempt)
+        attempt += 1
+        logging.warning("Retrying delete of pack %s in %.2f seconds: %s", pack_id, delay, error)
+        time.sleep(delay)
+
+# Retry the vector deletions recorded as pending for a user (all users when
+# None). progress receives the status of every pack, as delete_packs reports
+# it. Returns the names of the packs that are still pending.
+def retry_pending_deletions(username=None, lambda_client=None, journal=None, progress=None):
+    lambda_client = lambda_client or get_lambda_client()
+    journal = journal or get_upload_journal()
+    pending_deletions = journal.pending_deletions(username)
+    # The packs themselves are already deleted; only their vectors are left
+    statuses = {pending['pack_name']: {"state": "deleted", "vectors": "queued", "error": pending['last_error']}
+                for pending in pending_deletions}
+
+    def update(pack_name, **fields):
+        statuses[pack_name] = dict(statuses[pack_name], **fields)
+        if progress is not None:
+            progress({"packs": dict(statuses)})
+
+    if progress is not None:
+        progress({"packs": dict(statuses)})
+    remaining = []
+    for pending in pending_deletions:
+        update(pending['pack_name'], vectors="deleting")
+        error = delete_pack_vectors(lambda_client, pending['username'], pending['pack_name'])
+        if error is None:
+            journal.clear_pending_deletion(pending['username'], pending['pack_name'])
+            get_metrics().increment('pending_deletions_cleared_total')
+            update(pending['pack_name'], vectors="deleted", error=None)
+        else:
+            logging.error("Vectors of pack %s are still not deleted: %s", pending['pack_name'], error)
+            journal.record_deletion_attempt(pending['username'], pending['pack_name'], error)
+            remaining.append(pending['pack_name'])
+            update(pending['pack_name'], vectors="pending", error=error)
+    return remaining
+
+# Finish a pending vector deletion of a pack name before a new pack reuses it,
+# so a later retry cannot delete the new pack's vectors. Returns None when
+# nothing is pending any more, or the error.
+def finish_pending_deletion(username, pack_name, lambda_client=None, journal=None):
+    journal = journal or get_upload_journal()
+    if not any(pending['pack_name'] == pack_name for pending in journal.pending_deletions(username)):
+        return None
+    error = delete_pack_vectors(lambda_client or get_lambda_client(), username, pack_name)
+    if error is None:
+        journal.clear_pending_deletion(username, pack_name)
+        get_metrics().increment('pending_deletions_cleared_total')
+    else:
+        journal.record_deletion_attempt(username, pack_name, error)
+    return error
+
+# Delete several packs at once. packs is a list of (pack_id, pack_name) pairs.
+# Each pack's record is deleted through the API first, and only once that
+# succeeds its vectors through the Lambda, with DELETE_CONCURRENCY packs in
+# flight; progress receives the status of every pack. A pack the API fails to
+# delete keeps its vectors and manifest untouched. A vector deletion is
+# journaled before it is attempted and stays pending until it succeeds, so a
+# failure leaves no orphaned vectors behind: retry_pending_deletions picks it
+# up on the next delete.
+def delete_packs(packs, access_token, username, lambda_client=None, max_workers=DELETE_CONCURRENCY, progress=None,
+                 journal=None):
+    lambda_client = lambda_client or get_lambda_client()
+    journal = journal or get_upload_journal()
+    metrics = get_metrics()
+    statuses = {pack_name: {"state": "queued", "vectors": "queued", "error": None} for _, pack_name in packs}
+    statuses_lock = threading.Lock()
+
+    def update(pack_name, **fields):
+        with statuses_lock:
+            statuses[pack_name] = dict(statuses[pack_name], **fields)
+            if progress is not None:
+                progress({"packs": dict(statuses)})
+
+    def delete_one(pack_id, pack_name):
+        update(pack_name, state="deleting")
+        error = delete_pack_record(access_token, pack_id)
+        if error is not None:
+            logging.error("Could not delete pack %s: %s", pack_name, error)
+            metrics.increment('packs_deleted_total', status='failed')
+            update(pack_name, state="failed", vectors="kept", error=error)
+            return
+
+        # Forget what was uploaded so a new pack with this name starts clean
+        delete_manifest(username, pack_name)
+        journal.forget_pack_s3_objects(username, pack_name)
+        metrics.increment('packs_deleted_total', status='ok')
+        update(pack_name, vectors="deleting")
+
+        journal.add_pending_deletion(username, pack_name)
+        vector_error = delete_pack_vectors(lambda_client, username, pack_name)
+        if vector_error is None:
+            journal.clear_pending_deletion(username, pack_name)
+        else:
+            logging.error("Could not delete vectors of pack %s, will retry: %s", pack_name, vector_error)
+            journal.record_deletion_attempt(username, pack_name, vector_error)
+        update(pack_name, state="deleted", vectors="deleted" if vector_error is None else "pending",
+               error=vector_error)
+
+    # Vector deletions left over from earlier failures go first
+    retry_pending_deletions(username, lambda_client, journal)
+
+    if progress is not None:
+        progress({"packs": dict(statuses)})
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for future in [executor.submit(delete_one, pack_id, pack_name) for pack_id, pack_name in packs]:
+            future.result()
+
+    return {
+        "deleted": [name for name, status in statuses.items() if status['state'] == "deleted"],
+        "failed": {name: status['error'] for name, status in statuses.items() if status['state'] == "failed"},
+        "pending_vectors": [name for name, status in statuses.items() if status['vectors'] == "pending"],
+    }
@@ -0,0 +1,165 @@
+import fnmatch
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from load_data import get_s3_client, load_file, read_s3_object
+from metrics import get_metrics
+from upload_data import slim_summary, upload_sources
+from upload_journal import get_upload_journal
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Objects fetched and parsed at once when ingesting a prefix
+S3_INGEST_CONCURRENCY = int(os.getenv('S3_INGEST_CONCURRENCY', '8'))
+
+_GLOB_CHARS = '*?['
+
+# Objects of a bucket to ingest with ingest_s3_prefix, kept in session state
+# until the upload runs
+class S3Prefix:
+    def __init__(self, bucket_name, pattern):
+        self.bucket_name = bucket_name
+        self.pattern = pattern
+
+    def __repr__(self):
+        return f"S3Prefix(s3://{self.bucket_name}/{self.pattern})"
+
+# Whether an object name selects many objects: a prefix ending in '/', a glob
+# pattern, or empty for the whole bucket
+def is_s3_pattern(name):
+    return not name or name.endswith('/') or any(char in name for char in _GLOB_CHARS)
+
+def _literal_prefix(pattern):
+    glob_at = min((pattern.index(char) for char in _GLOB_CHARS if char in pattern), default=len(pattern))
+    return pattern[:glob_at]
+
+# Whether a key is under a prefix or matches a glob; '*' also matches '/'
+def key_matches(key, pattern):
+    if _literal_prefix(pattern) == pattern:
+        return key.startswith(pattern)
+    return fnmatch.fnmatchcase(key, pattern)
+
+# The objects under a prefix, or matching a glob such as 'exports/2024-*/*.csv',
+# as dicts of key, etag and size. Listing pages through list_objects_v2 from
+# the longest literal prefix of the pattern.
+def list_s3_objects(bucket_name, pattern, s3_client=None):
+    s3 = s3_client or get_s3_client()
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=_literal_prefix(pattern)):
+        for item in page.get('Contents', []):
+            if not item['Key'].endswith('/') and key_matches(item['Key'], pattern):
+                yield {"key": item['Key'], "etag": item['ETag'], "size": item['Size']}
+
+# Fetch an object as listed and parse it by its format. IfMatch makes sure the
+# bytes are the version whose ETag is recorded once it is uploaded.
+def load_s3_object(bucket_name, item, s3_client=None):
+    s3 = s3_client or get_s3_client()
+    with get_metrics().timer('stage_seconds', stage='load', source='s3'):
+        body = read_s3_object(bucket_name, item['key'], s3, etag=item['etag'], size=item['size'])
+        return load_file(body, file_name=item['key'])
+
+# Yield (item, data, error) for each object in order while later objects are
+# fetched and parsed on a bounded thread pool sharing one S3 client. At most
+# twice max_workers parsed objects are held at once.
+def iter_s3_objects(bucket_name, items, s3_client=None, max_workers=S3_INGEST_CONCURRENCY):
+    s3 = s3_client or get_s3_client()
+    max_workers = max(1, max_workers)
+    pending = deque()
+
+    def collect():
+        item, future = pending.popleft()
+        try:
+            return item, future.result(), None
+        except Exception as e:
+            logging.error("Failed to load s3://%s/%s: %s", bucket_name, item['key'], e)
+            get_metrics().increment('load_failures_total', source='s3')
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            pending.append((item, executor.submit(load_s3_object, bucket_name, item, s3)))
+            if len(pending) >= max_workers * 2:
+                yield collect()
+        while pending:
+            yield collect()
+
+# Ingest every object under a prefix or glob pattern into a pack. Each object
+# is its own source, s3://bucket/key, and all of them go through one upload
+# (upload_sources), so small objects share batches and the pack's manifest is
+# updated once, while the next objects are fetched and parsed concurrently.
+# Objects uploaded before with the same ETag and upload options are skipped,
+# and the records of objects that were deleted from S3 are deleted from the
+# pack. fetch_workers objects are fetched at once; the upload_to_pinecone
+# options, such as max_workers for its batches, apply to the whole upload.
+# Returns totals over all objects, with failed batches listed as in slim_summary.
+def ingest_s3_prefix(bucket_name, pattern, index_name, username, lambda_client=None, s3_client=None,
+                     fetch_workers=S3_INGEST_CONCURRENCY, progress=None, journal=None, **upload_options):
+    journal = journal or get_upload_journal()
+    # Options that change the records; an object uploaded with others is sent again
+    params = json.loads(json.dumps({key: upload_options.get(key)
+                                    for key in ('text_columns', 'separator', 'dedup_threshold')}))
+    uploaded = journal.s3_objects(username, index_name, bucket_name)
+
+    items = list(list_s3_objects(bucket_name, pattern, s3_client))
+    listed = {item['key'] for item in items}
+    changed = [item for item in items if uploaded.get(item['key']) != (item['etag'], params)]
+    removed = sorted(key for key in uploaded if key not in listed and key_matches(key, pattern))
+    logging.info("s3://%s/%s: %d objects, %d new or changed, %d removed.", bucket_name, pattern, len(items),
+                 len(changed), len(removed))
+
+    totals = {"objects": len(items), "unchanged": len(items) - len(changed), "uploaded": 0, "removed": 0,
+              "bytes_read": 0, "records_sent": 0, "bytes_sent": 0, "total_batches": 0, "skipped": 0, "deleted": 0,
+              "duplicates": 0, "near_duplicates": 0, "failed": [], "failed_objects": {}}
+    if not changed and not removed:
+        return totals
+
+    fetched = []
+
+    def report(fields=None):
+        if progress is not None:
+            fields = fields or {}
+            progress({"objects_done": len(fetched) + len(totals['failed_objects']),
+                      "objects_total": len(changed),
+                      "batches_done": fields.get('batches_done', 0),
+                      "records_sent": fields.get('records_sent', 0)})
+
+    # Objects are read as the upload consumes them; an empty list as a removed
+    # object's data deletes its records
+    def iter_sources():
+        for item, data, error in iter_s3_objects(bucket_name, changed, s3_client, fetch_workers):
+            if error is not None:
+                totals['failed_objects'][item['key']] = str(error)
+                report()
+                continue
+            totals['bytes_read'] += item['size']
+            fetched.append(item)
+            yield f"s3://{bucket_name}/{item['key']}", data
+        for key in removed:
+            yield f"s3://{bucket_name}/{key}", []
+
+    summary = upload_sources(iter_sources(), index_name, username, lambda_client=lambda_client, progress=report,
+                             journal=journal, upload_source=f"s3://{bucket_name}/{pattern}", **upload_options)
+    for key in ('records_sent', 'bytes_sent', 'total_batches', 'skipped', 'deleted', 'duplicates',
+                'near_duplicates'):
+        totals[key] = summary[key]
+    totals['failed'] = slim_summary(summary)['failed']
+
+    for item in fetched:
+        failed = summary['sources'][f"s3://{bucket_name}/{item['key']}"]['failed']
+        if failed:
+            totals['failed_objects'][item['key']] = f"{failed} records failed to upload"
+        else:
+            journal.mark_s3_object(username, index_name, bucket_name, item['key'], item['etag'], params)
+            totals['uploaded'] += 1
+    for key in removed:
+        if not summary['sources'][f"s3://{bucket_name}/{key}"]['delete_failed']:
+            journal.forget_s3_object(username, index_name, bucket_name, key)
+            totals['removed'] += 1
+
+    logging.info("Ingested s3://%s/%s into %s: %d objects uploaded, %d unchanged, %d removed, %d failed.",
+                 bucket_name, pattern, index_name, totals['uploaded'], totals['unchanged'], totals['removed'],
+                 len(totals['failed_objects']))
+    return totals
@@ -0,0 +1,304 @@
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Where datasets added to a pack wait for upload, one directory per session
+STAGING_DIR = os.getenv('STAGING_DIR', os.path.join(os.path.expanduser('~'), '.packman', 'staging'))
+
+# Bytes one session may stage, and bytes staged by all sessions together
+STAGING_SESSION_QUOTA = int(os.getenv('STAGING_SESSION_QUOTA', str(2 * 1024 ** 3)))
+STAGING_TOTAL_QUOTA = int(os.getenv('STAGING_TOTAL_QUOTA', str(20 * 1024 ** 3)))
+
+# Seconds a session can be idle before its staged datasets are evicted
+STAGING_TTL = int(os.getenv('STAGING_TTL', str(24 * 3600)))
+
+# Rows per record batch in staged files, and so per chunk handed to the upload
+STAGING_BATCH_ROWS = int(os.getenv('STAGING_BATCH_ROWS', '50000'))
+
+_METADATA_KEY = b'packman'
+_ACTIVE_FILE = '.active'
+
+# Raised when staging a dataset would exceed a quota
+class StagingQuotaError(RuntimeError):
+    pass
+
+# Null marker of an object column: NaN (as read_csv gives) or None. Arrow
+# stores both as null, so the marker is kept to restore str() output exactly.
+def _null_marker(column):
+    nulls = column[column.isna()]
+    if nulls.empty:
+        return None
+    kinds = {'nan' if isinstance(value, float) else 'none' if value is None else 'other' for value in nulls}
+    if len(kinds) > 1 or 'other' in kinds:
+        raise ValueError(f"Column {column.name!r} mixes missing value markers")
+    return kinds.pop()
+
+# pyarrow is imported where it is used, so the app can start without it
+def _dataframe_table(data):
+    import pyarrow as pa
+
+    markers = {}
+    for name in data.columns:
+        if data[name].dtype == object:
+            marker = _null_marker(data[name])
+            if marker == 'nan':
+                markers[str(name)] = marker
+    # A default RangeIndex is rebuilt on read; any other index is stored
+    default_index = isinstance(data.index, pd.RangeIndex) and data.index.start == 0 and data.index.step == 1
+    if not all(isinstance(name, str) for name in data.columns):
+        raise ValueError("Only DataFrames with string column names can be staged")
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=not default_index)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"DataFrame cannot be staged: {e}") from e
+    metadata = {"kind": "dataframe", "default_index": default_index, "nan_columns": markers}
+    return table.replace_schema_metadata({**table.schema.metadata, _METADATA_KEY: json.dumps(metadata).encode('utf-8')})
+
+def _texts_table(data):
+    import pyarrow as pa
+
+    table = pa.table({"text": pa.array(data, type=pa.large_string())})
+    return table.replace_schema_metadata({_METADATA_KEY: json.dumps({"kind": "texts"}).encode('utf-8')})
+
+# Lightweight handle to a staged dataset, cheap to keep in session state.
+# Iterating it reads the file through a memory map one record batch at a
+# time, yielding DataFrames or lists of strings as upload_to_pinecone expects.
+class StagedDataset:
+    def __init__(self, store, session_id, dataset_id, path, kind, rows, size):
+        self.store = store
+        self.session_id = session_id
+        self.dataset_id = dataset_id
+        self.path = path
+        self.kind = kind
+        self.rows = rows
+        self.size = size
+
+    def __repr__(self):
+        return f"StagedDataset({self.kind}, {self.rows} rows, {self.size} bytes)"
+
+    def __iter__(self):
+        import pyarrow as pa
+
+        with self.store.reading(self), pa.memory_map(self.path) as source:
+            reader = pa.ipc.open_file(source)
+            metadata = json.loads(reader.schema.metadata[_METADATA_KEY])
+            offset = 0
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if metadata['kind'] == 'texts':
+                    yield batch.column(0).to_pylist()
+                    continue
+                chunk = batch.to_pandas()
+                for name in metadata['nan_columns']:
+                    chunk[name] = chunk[name].fillna(np.nan)
+                if metadata['default_index']:
+                    chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+                offset += len(chunk)
+                yield chunk
+
+    # First rows, for display
+    def head(self, rows=5):
+        for chunk in self:
+            return chunk[:rows]
+        return [] if self.kind == 'texts' else pd.DataFrame()
+
+# Handle to an uploaded file staged as it was uploaded, for files too large to
+# parse up front. Iterating it streams the file in chunks by its format.
+class StagedFile(StagedDataset):
+    def __init__(self, store, session_id, dataset_id, path, file_name, size):
+        super().__init__(store, session_id, dataset_id, path, 'file', None, size)
+        self.file_name = file_name
+
+    def __repr__(self):
+        return f"StagedFile({self.file_name}, {self.size} bytes)"
+
+    def __iter__(self):
+        from load_data import load_file_chunks
+
+        with self.store.reading(self):
+            yield from load_file_chunks(self.path, file_name=self.file_name)
+
+    def head(self, rows=5):
+        for chunk in self:
+            return chunk[:rows]
+        return []
+
+# Disk-backed store for datasets staged for upload. Datasets are written as
+# uncompressed Arrow IPC files that are read back through memory maps, so
+# session state only holds StagedDataset handles. Sessions are limited to
+# session_quota bytes and the store to total_quota; sessions idle for longer
+# than ttl are evicted, except while one of their datasets is being read.
+class StagingStore:
+    def __init__(self, directory=STAGING_DIR, session_quota=STAGING_SESSION_QUOTA,
+                 total_quota=STAGING_TOTAL_QUOTA, ttl=STAGING_TTL):
+        self.directory = directory
+        self.session_quota = session_quota
+        self.total_quota = total_quota
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._reading = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.directory, session_id)
+
+    def _usage(self, path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    # Mark a session as active so it is not evicted
+    def touch(self, session_id):
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, _ACTIVE_FILE), 'a'):
+            pass
+        os.utime(os.path.join(session_dir, _ACTIVE_FILE))
+
+    def _last_active(self, session_dir):
+        try:
+            return os.path.getmtime(os.path.join(session_dir, _ACTIVE_FILE))
+        except OSError:
+            return os.path.getmtime(session_dir)
+
+    # Remove the datasets of sessions idle for longer than ttl
+    def evict_abandoned(self):
+        cutoff = time.time() - self.ttl
+        evicted = 0
+        with self._lock:
+            busy = {session_id for session_id, count in self._reading.items() if count}
+            for session_id in os.listdir(self.directory):
+                session_dir = self._session_dir(session_id)
+                if session_id in busy or not os.path.isdir(session_dir):
+                    continue
+                try:
+                    if self._last_active(session_dir) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                shutil.rmtree(session_dir, ignore_errors=True)
+                evicted += 1
+        if evicted:
+            logging.info("Evicted staged data of %d abandoned sessions.", evicted)
+        return evicted
+
+    # Write data (a DataFrame or list of strings) to disk for session_id and
+    # return its handle. Raises StagingQuotaError when a quota would be
+    # exceeded, and ValueError for data Arrow cannot hold exactly.
+    def stage(self, session_id, data):
+        import pyarrow as pa
+
+        if isinstance(data, pd.DataFrame):
+            kind, table = 'dataframe', _dataframe_table(data)
+        elif isinstance(data, list) and all(isinstance(item, str) for item in data):
+            kind, table = 'texts', _texts_table(data)
+        else:
+            raise ValueError(f"Cannot stage data of type {type(data).__name__}")
+
+        self.touch(session_id)
+        self.evict_abandoned()
+        dataset_id = uuid.uuid4().hex
+        session_dir = self._session_dir(session_id)
+        # The file holds about the table's bytes; refuse before writing it
+        with self._lock:
+            self._check_quota(session_dir, table.nbytes)
+        path = os.path.join(session_dir, f"{dataset_id}.arrow")
+        temp_path = path + '.tmp'
+        with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=STAGING_BATCH_ROWS)
+        size = self._commit(session_dir, temp_path, path)
+        logging.info("Staged %s with %d rows (%d bytes) at %s", kind, table.num_rows, size, path)
+        return StagedDataset(self, session_id, dataset_id, path, kind, table.num_rows, size)
+
+    # Write the bytes of an uploaded file to disk for session_id as they are,
+    # and return its handle. file_name picks the format it is read with.
+    # Raises StagingQuotaError when a quota would be exceeded.
+    def stage_file(self, session_id, buffer, file_name):
+        self.touch(session_id)
+        self.evict_abandoned()
+        dataset_id = uuid.uuid4().hex
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            self._check_quota(session_dir, memoryview(buffer).nbytes)
+        path = os.path.join(session_dir, f"{dataset_id}{os.path.splitext(file_name)[1].lower()}")
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(buffer)
+        size = self._commit(session_dir, temp_path, path)
+        logging.info("Staged file %s (%d bytes) at %s", file_name, size, path)
+        return StagedFile(self, session_id, dataset_id, path, file_name, size)
+
+    # Raise StagingQuotaError if staging size more bytes would exceed a quota.
+    # written is how many of them are already on disk. Called with the lock held.
+    def _check_quota(self, session_dir, size, written=0):
+        session_usage = self._usage(session_dir) - written
+        total_usage = self._usage(self.directory) - written
+        if session_usage + size > self.session_quota or total_usage + size > self.total_quota:
+            raise StagingQuotaError(
+                f"Staging {size} bytes would exceed the quota ({session_usage} of {self.session_quota} bytes "
+                f"used by this session, {total_usage} of {self.total_quota} in total)"
+            )
+
+    # Move a written temporary file into place if the quotas still allow it,
+    # as other datasets may have been staged meanwhile, or remove it and raise
+    # StagingQuotaError. Returns its size.
+    def _commit(self, session_dir, temp_path, path):
+        size = os.path.getsize(temp_path)
+        with self._lock:
+            try:
+                self._check_quota(session_dir, size, written=size)
+            except StagingQuotaError:
+                os.remove(temp_path)
+                raise
+            os.replace(temp_path, path)
+        return size
+
+    # Keep the session of a dataset from being evicted while it is read
+    @contextlib.contextmanager
+    def reading(self, dataset):
+        with self._lock:
+            self._reading[dataset.session_id] = self._reading.get(dataset.session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reading[dataset.session_id] -= 1
+
+    def discard(self, dataset):
+        try:
+            os.remove(dataset.path)
+        except FileNotFoundError:
+            pass
+
+    def discard_session(self, session_id):
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    # Bytes currently staged by a session
+    def usage(self, session_id):
+        return self._usage(self._session_dir(session_id))
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+# Staging store shared by every session in this process
+def get_staging_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = StagingStore()
+        return _default_store
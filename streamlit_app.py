@@ -1,11 +1,17 @@
 import streamlit as st
-import boto3
-import json
 import logging
-import os
-import requests
+import uuid
 from dotenv import load_dotenv
-from load_data import load_csv, load_web, load_s3_file
+import api_client
+from dedup import DEDUP_THRESHOLD
+from load_data import LOCAL_STREAM_THRESHOLD, load_buffer, load_web, load_s3_file
+from jobs import get_job_runner
+from manifest import start_manifest
+from pack_deletion import delete_packs, finish_pending_deletion, retry_pending_deletions
+from s3_ingest import S3Prefix, ingest_s3_prefix, is_s3_pattern, list_s3_objects
+from staging import StagedDataset, StagingQuotaError, get_staging_store
+from upload_data import resume_upload, slim_summary, upload_to_pinecone
+from upload_journal import get_upload_journal
 import pandas as pd
 
 # Load environment variables
@@ -14,9 +20,6 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# API URL
-API_URL = os.getenv('API_URL', 'http://localhost:5000')
-
 # Initialize session state for login
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -31,19 +34,27 @@ if 'user_id' not in st.session_state:
 if 'register_trigger' not in st.session_state:
     st.session_state.register_trigger = False
 
+# Identify this session's staged upload data on disk
+if 'staging_id' not in st.session_state:
+    st.session_state.staging_id = uuid.uuid4().hex
+get_staging_store().touch(st.session_state.staging_id)
+
 # Initialize session state for delete pack
 if 'show_delete_pack_selectbox' not in st.session_state:
     st.session_state.show_delete_pack_selectbox = False
 
-# Initialize a session using Boto3 for S3 operations only
-session = boto3.Session(
-    aws_access_key_id=st.secrets["default"]["ACCESS_KEY"],
-    aws_secret_access_key=st.secrets["default"]["SECRET_KEY"],
-    region_name=st.secrets["default"]["REGION"]
-)
+# Create a Lambda client for non-auth operations. It is built on first use,
+# not on every rerun, and shared by all sessions; boto3 clients are thread-safe.
+@st.cache_resource
+def get_lambda_client():
+    import boto3
 
-# Create a Lambda client for non-auth operations
-lambda_client = session.client('lambda')
+    session = boto3.Session(
+        aws_access_key_id=st.secrets["default"]["ACCESS_KEY"],
+        aws_secret_access_key=st.secrets["default"]["SECRET_KEY"],
+        region_name=st.secrets["default"]["REGION"]
+    )
+    return session.client('lambda')
 
 # Function to toggle registration page
 def register_trigger():
@@ -56,27 +67,10 @@ def back_to_login():
 # Function to fetch current packs
 def get_current_packs():
     try:
-        # Make a request to the Flask API to get user packs
-        headers = {'Authorization': f'Bearer {st.session_state.access_token}'}
-        response = requests.get(f'{API_URL}/user/packs', headers=headers)
-        
-        if response.status_code == 200:
-            packs = response.json()
-            
-            # Transform the data to match the expected format
-            formatted_packs = []
-            for pack in packs:
-                formatted_packs.append({
-                    'Pack Name': pack['pack_name'],
-                    'Description': pack['description'],
-                    'Date Created': pack['date_created'].split('T')[0] if 'T' in pack['date_created'] else pack['date_created'],
-                    'Pack ID': pack['id']
-                })
-            return formatted_packs
-        else:
-            logging.error("Failed to fetch packs: %s", response.text)
-            return []
-            
+        # Cached per user; refreshed by the API client when stale
+        packs = api_client.get_packs(st.session_state.access_token)
+        return packs if packs is not None else []
+
     except Exception as e:
         logging.error("Error fetching packs: %s", e)
         return []
@@ -97,13 +91,7 @@ def login_page():
         
         try:
             # Make a request to the Flask API for login
-            response = requests.post(
-                f'{API_URL}/login',
-                json={
-                    'username': username,
-                    'password': password
-                }
-            )
+            response = api_client.login(username, password)
             
             if response.status_code == 200:
                 data = response.json()
@@ -125,12 +113,45 @@ def login_page():
 # Function to log out the user
 def logout():
     logging.info("User logged out.")
+    api_client.invalidate_packs(st.session_state.access_token)
     st.session_state.logged_in = False
     st.session_state.access_token = None
     st.session_state.username = None
     st.session_state.user_id = None
     st.session_state.logout_trigger = not st.session_state.logout_trigger
 
+# Upload job: upload data to a pack, then drop its staged copy once every batch is delivered.
+# An S3 prefix is ingested object by object.
+def upload_staged(data, pack, username, progress=None, **kwargs):
+    if isinstance(data, S3Prefix):
+        # Every object is uploaded as its own source
+        kwargs.pop('source', None)
+        return slim_summary(ingest_s3_prefix(data.bucket_name, data.pattern, pack, username, progress=progress,
+                                             **kwargs))
+    upload_id = uuid.uuid4().hex
+    keep_for_resume(data, upload_id, progress)
+    summary = upload_to_pinecone(data, pack, username, progress=progress, upload_id=upload_id, **kwargs)
+    return finish_staged(data, summary)
+
+# Upload job: continue a failed or interrupted upload of staged data from its checkpoints
+def resume_staged(upload_id, data, progress=None):
+    keep_for_resume(data, upload_id, progress)
+    summary = resume_upload(upload_id, data, progress=progress)
+    if summary is None:
+        raise RuntimeError(f"Upload {upload_id} is no longer in the journal")
+    return finish_staged(data, summary)
+
+# Keep the upload id and staged data handle with the job, so a failed job can be resumed
+def keep_for_resume(data, upload_id, progress):
+    if isinstance(data, StagedDataset) and progress is not None:
+        progress({"resume": {"upload_id": upload_id, "data": data}})
+
+def finish_staged(data, summary):
+    if isinstance(data, StagedDataset) and not summary['failed']:
+        get_staging_store().discard(data)
+    # The job keeps its result for a while; the ids of every batch are not needed
+    return slim_summary(summary)
+
 # Function to display the main page
 def main_page():
     st.sidebar.title("Navigation")
@@ -157,24 +178,25 @@ def main_page():
         if submit_button:
             if pack_name and pack_description:
                 try:
-                    # Make a request to the Flask API to create a new pack
-                    headers = {'Authorization': f'Bearer {st.session_state.access_token}'}
-                    response = requests.post(
-                        f'{API_URL}/user/packs',
-                        headers=headers,
-                        json={
-                            'pack_name': pack_name,
-                            'description': pack_description
-                        }
-                    )
-                    
-                    if response.status_code in [200, 201]:
-                        st.success("Pack created successfully!")
-                        logging.info("Pack created successfully: %s", response.text)
-                        st.rerun()
+                    # A deleted pack of the same name must be fully cleaned up first
+                    cleanup_error = finish_pending_deletion(st.session_state.username, pack_name,
+                                                            lambda_client=get_lambda_client())
+                    if cleanup_error is not None:
+                        st.error(f"A deleted pack named {pack_name} is still being cleaned up. Please try again later.")
+                        logging.error("Pending deletion of pack %s failed: %s", pack_name, cleanup_error)
                     else:
-                        st.error("Failed to create pack. Please try again.")
-                        logging.error("Failed to create pack: %s", response.text)
+                        # Make a request to the Flask API to create a new pack
+                        response = api_client.create_pack(st.session_state.access_token, pack_name, pack_description)
+
+                        if response.status_code in [200, 201]:
+                            # A new pack holds no vectors from before content ids
+                            start_manifest(st.session_state.username, pack_name)
+                            st.success("Pack created successfully!")
+                            logging.info("Pack created successfully: %s", response.text)
+                            st.rerun()
+                        else:
+                            st.error("Failed to create pack. Please try again.")
+                            logging.error("Failed to create pack: %s", response.text)
                     
                 except Exception as e:
                     st.error("An error occurred while creating the pack.")
@@ -191,14 +213,15 @@ def main_page():
         else:
             st.write("No packs available.")
 
-        # Initialize data
+        # Initialize data and a label identifying where it came from
         data = None
+        source = None
 
         # Select data type
         st.subheader("Data Uploads")
         option = st.selectbox(
             "Choose data type",
-            ("Webpage", "LocalFile", "AWS S3"),
+            ("Webpage", "Website crawl", "LocalFile", "AWS S3"),
         )
 
         st.write("You selected:", option)
@@ -208,31 +231,68 @@ def main_page():
             if url:
                 # Load and split the web page content
                 data = load_web(url)
+                source = url
                 st.write("Loaded web page content splits:")
                 st.write(data[:5])  # Display the first 5 chunks
 
-        elif option == "LocalFile":
-            uploaded_file = st.file_uploader("Upload a file", type=["csv", "txt"])
-            if uploaded_file is not None:
-                # Save the uploaded file temporarily
-                temp_file_path = f"temp_{uploaded_file.name}"
-                with open(temp_file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+        elif option == "Website crawl":
+            # aiohttp is only loaded by sessions that crawl
+            from crawler import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, iter_crawl_chunks, parse_seeds
 
-                # Load the document using load_csv
-                data = load_csv([temp_file_path])
-                st.write("Loaded document content:")
-                st.write(data.head())  # Display the first few rows
+            seed_text = st.text_area("Seed URLs, URL list or sitemap (one per line)", "https://docs.streamlit.io/sitemap.xml")
+            max_depth = st.number_input("Link depth", min_value=0, max_value=5, value=CRAWL_MAX_DEPTH)
+            max_pages = st.number_input("Maximum pages", min_value=1, max_value=5000, value=CRAWL_MAX_PAGES)
+            seeds = parse_seeds(seed_text)
+            if seeds:
+                # Pages are fetched and chunked while the upload runs
+                data = iter_crawl_chunks(seeds, max_depth=int(max_depth), max_pages=int(max_pages))
+                source = "crawl:" + " ".join(seeds)
+                st.write(f"Will crawl up to {int(max_pages)} pages from {len(seeds)} seed URLs during the upload.")
 
-                # Clean up the temporary file
-                os.remove(temp_file_path)
+        elif option == "LocalFile":
+            uploaded_file = st.file_uploader(
+                "Upload a file",
+                type=["csv", "txt", "md", "jsonl", "ndjson", "parquet", "feather", "arrow"],
+            )
+            if uploaded_file is not None:
+                source = f"file://{uploaded_file.name}"
+                if uploaded_file.size > LOCAL_STREAM_THRESHOLD:
+                    # Large files are staged as uploaded and read in chunks during the upload
+                    data = uploaded_file
+                    st.write(f"{uploaded_file.name} is {uploaded_file.size // (1024 * 1024)} MB; it will be read in chunks during the upload.")
+                else:
+                    # Parse the uploaded bytes in place
+                    data = load_buffer(uploaded_file.getbuffer(), uploaded_file.name)
+                    if isinstance(data, pd.DataFrame):
+                        st.write("Loaded document content:")
+                        st.write(data.head())  # Display the first few rows
+                    elif isinstance(data, list):
+                        st.write("Loaded document content:")
+                        st.write(data[:5])  # Display the first 5 chunks
 
         elif option == "AWS S3":
             bucket = st.text_input("Bucket Name", "public-test543464")
-            file_name = st.text_input("File Name", "customers-full.csv")
-            if bucket and file_name:
+            file_name = st.text_input("File Name, prefix ending in / or pattern such as exports/*.csv", "customers-full.csv")
+            if bucket and file_name and is_s3_pattern(file_name):
+                # Matching objects are fetched and uploaded during the upload; unchanged ones are skipped
+                try:
+                    preview = [item['key'] for _, item in zip(range(10), list_s3_objects(bucket, file_name))]
+                except Exception as e:
+                    logging.error("Error listing S3 objects: %s", e)
+                    preview = None
+                if preview:
+                    data = S3Prefix(bucket, file_name)
+                    source = f"s3://{bucket}/{file_name}"
+                    st.write("Matching objects (first 10):")
+                    st.write(preview)
+                elif preview is None:
+                    st.error("Failed to list objects in S3.")
+                else:
+                    st.error("No objects match this prefix or pattern.")
+            elif bucket and file_name:
                 # Load the full file content from S3
                 data = load_s3_file(bucket, file_name)
+                source = f"s3://{bucket}/{file_name}"
                 if data is not None:
                     st.write("Loaded S3 file content:")
                     st.write(data.head())  # Display the first few rows
@@ -257,34 +317,96 @@ def main_page():
             st.session_state.selected_packs = []
         if 'uploaded_data' not in st.session_state:
             st.session_state.uploaded_data = []
+        if 'uploaded_sources' not in st.session_state:
+            st.session_state.uploaded_sources = [None] * len(st.session_state.uploaded_data)
 
         # Add another pack
         if st.button("Add data to pack"):
             if pack_option and data is not None:
+                # Keep loaded data, and large uploaded files, on disk and only a handle in the session
+                try:
+                    if isinstance(data, (pd.DataFrame, list)):
+                        data = get_staging_store().stage(st.session_state.staging_id, data)
+                    elif option == "LocalFile":
+                        data = get_staging_store().stage_file(st.session_state.staging_id, data.getbuffer(), data.name)
+                except StagingQuotaError as e:
+                    st.error(f"Not enough staging space for this data: {e}")
+                    st.stop()
+                except ValueError as e:
+                    logging.warning("Keeping data in memory; it cannot be staged: %s", e)
                 st.session_state.selected_packs.append(pack_option)
                 st.session_state.uploaded_data.append(data)
+                st.session_state.uploaded_sources.append(source)
                 st.write(f"Added {pack_option} with data to session.")
                 # Reset the selection and data
                 st.session_state.show_delete_pack_selectbox = False
                 st.rerun()
 
-        # Upload all data to Pinecone
+        # Near duplicates are mostly chunk overlap and boilerplate repeated across pages
+        skip_near_duplicates = st.checkbox("Skip near-duplicate chunks",
+                                           help=f"Chunks at least {DEDUP_THRESHOLD:.0%} similar to an earlier chunk "
+                                                "of the same source are not embedded.")
+
+        # Upload all data to Pinecone in the background
         if st.button("Upload all data to Pinecone"):
             if st.session_state.uploaded_data and st.session_state.selected_packs:
-                for pack, data in zip(st.session_state.selected_packs, st.session_state.uploaded_data):
-                    response = upload_to_pinecone(data, pack)
-                    if response:
-                        st.success(f"Data for {pack} uploaded to Pinecone successfully!")
-                    else:
-                        st.error(f"Failed to upload data for {pack} to Pinecone.")
-                # Clear session data after upload
+                runner = get_job_runner()
+                for pack, data, source in zip(st.session_state.selected_packs, st.session_state.uploaded_data, st.session_state.uploaded_sources):
+                    job_id = runner.submit(
+                        "upload", upload_staged, data, pack, st.session_state.username,
+                        source=source, dedup_threshold=DEDUP_THRESHOLD if skip_near_duplicates else None,
+                        owner=st.session_state.username, description=f"Upload {source or 'data'} to {pack}"
+                    )
+                    logging.info("Submitted upload job %s for pack %s", job_id, pack)
+                st.success("Upload started. You can keep working; progress is shown below.")
+                # Clear session data once it is handed to the upload jobs
                 st.session_state.selected_packs.clear()
                 st.session_state.uploaded_data.clear()
+                st.session_state.uploaded_sources.clear()
             else:
                 st.error("No data loaded or pack not selected. Please load data and select a pack before uploading.")
 
+        # Show the status of this user's upload jobs
+        upload_jobs = [job for job in get_job_runner().list_jobs(st.session_state.username) if job['kind'] == "upload"]
+        if 'resumed_jobs' not in st.session_state:
+            st.session_state.resumed_jobs = set()
+        if upload_jobs:
+            st.subheader("Uploads")
+            st.button("Refresh upload status")
+            for job in upload_jobs:
+                progress = job['progress']
+                if job['state'] in ("queued", "running"):
+                    st.info(f"{job['description']}: {job['state']}, {progress.get('batches_done', 0)} batches "
+                            f"({progress.get('records_sent', 0)} records) sent so far.")
+                elif job['state'] == "failed":
+                    st.error(f"{job['description']} failed: {job['error']}")
+                elif not job['result']['failed'] and not job['result'].get('failed_objects'):
+                    summary = job['result']
+                    st.success(f"{job['description']}: uploaded to Pinecone successfully! "
+                               f"{summary['skipped']} unchanged chunks skipped, {summary['deleted']} removed chunks deleted, "
+                               f"{summary['duplicates'] + summary['near_duplicates']} duplicate chunks dropped.")
+                elif job['result'].get('failed_objects'):
+                    failed_objects = job['result']['failed_objects']
+                    st.error(f"{job['description']}: failed to upload {len(failed_objects)} objects: "
+                             f"{', '.join(sorted(failed_objects))}.")
+                else:
+                    summary = job['result']
+                    failed_batches = ', '.join(str(result['batch']) for result in summary['failed'])
+                    st.error(f"{job['description']}: failed to upload {len(summary['failed'])} of {summary['total_batches']} batches (batches {failed_batches}).")
+                # Staged uploads that failed can continue from their last checkpoint
+                resume = progress.get('resume')
+                failed = job['state'] == "failed" or (job['state'] == "succeeded" and job['result']['failed'])
+                if failed and resume and job['id'] not in st.session_state.resumed_jobs:
+                    if st.button("Resume", key=f"resume_{job['id']}"):
+                        get_job_runner().submit(
+                            "upload", resume_staged, resume['upload_id'], resume['data'],
+                            owner=st.session_state.username, description=f"Resume {job['description']}"
+                        )
+                        st.session_state.resumed_jobs.add(job['id'])
+                        st.rerun()
+
     elif action == "Delete Pack":
-        st.header("Delete a Pack")
+        st.header("Delete Packs")
 
         # Fetch current packs
         packs = get_current_packs()
@@ -293,55 +415,61 @@ def main_page():
             pack_name_to_id = {pack['Pack Name']: pack['Pack ID'] for pack in packs}
             pack_names = list(pack_name_to_id.keys())
             
-            selected_pack = st.selectbox("Select Pack to Delete", pack_names)
+            selected_packs = st.multiselect("Select Packs to Delete", pack_names)
 
             if st.button("Confirm Delete", key="confirm_delete_button"):
-                try:
-                    # Delete pack using Flask API
-                    headers = {'Authorization': f'Bearer {st.session_state.access_token}'}
-                    pack_id = pack_name_to_id[selected_pack]
-                    response = requests.delete(f'{API_URL}/user/packs/{pack_id}', headers=headers)
-                    
-                    if response.status_code in [200, 204]:
-                        # Now handle Pinecone deletion via Lambda (this part remains the same)
-                        pinecone_payload = {
-                            "body": {
-                                "action": "delete_pack",
-                                "username": st.session_state.username,
-                                "pack_name": selected_pack
-                            }
-                        }
-
-                        pinecone_response = lambda_client.invoke(
-                            FunctionName='pinecone-embedding-HelloWorldFunction-tHPspSqIP5SE',
-                            InvocationType='RequestResponse',
-                            Payload=json.dumps(pinecone_payload)
-                        )
-                        
-                        pinecone_response_payload = json.loads(pinecone_response['Payload'].read())
-
-                        # Handle Pinecone response
-                        if 'errorMessage' in pinecone_response_payload:
-                            if "does not exist" in pinecone_response_payload['errorMessage']:
-                                st.success(f"Pack {selected_pack} deleted successfully. It was already removed from Pinecone.")
-                            else:
-                                st.warning(f"Pack {selected_pack} deleted from database, but had an issue with Pinecone: {pinecone_response_payload['errorMessage']}")
-                        else:
-                            st.success(f"Successfully deleted pack: {selected_pack}")
-                        
-                        logging.info(f"Pack deleted from database: {response.text}, Pinecone: {pinecone_response_payload}")
-                        st.rerun()
-                    else:
-                        st.error(f"Failed to delete pack. Server responded with: {response.status_code}")
-                        logging.error(f"Delete failed - API response: {response.text}")
-
-                except Exception as e:
-                    st.error("An error occurred while deleting the pack.")
-                    logging.error("Error deleting pack: %s", e)
+                if selected_packs:
+                    # Delete in the background; the packs' status is shown below
+                    job_id = get_job_runner().submit(
+                        "delete", delete_packs, [(pack_name_to_id[name], name) for name in selected_packs],
+                        st.session_state.access_token, st.session_state.username,
+                        lambda_client=get_lambda_client(), owner=st.session_state.username,
+                        description=f"Delete {', '.join(selected_packs)}"
+                    )
+                    logging.info("Submitted delete job %s for packs %s", job_id, selected_packs)
+                    st.success("Deletion started. Progress is shown below.")
+                else:
+                    st.error("Please select at least one pack to delete.")
 
         else:
             st.write("No packs available to delete.")
 
+        # Vector deletions that failed earlier and are retried with the next delete
+        pending = get_upload_journal().pending_deletions(st.session_state.username)
+        if pending:
+            st.warning(f"Pinecone data of {len(pending)} deleted packs is still to be removed: "
+                       f"{', '.join(item['pack_name'] for item in pending)}")
+            if st.button("Retry cleanup"):
+                get_job_runner().submit(
+                    "delete", retry_pending_deletions, st.session_state.username,
+                    lambda_client=get_lambda_client(), owner=st.session_state.username,
+                    description="Retry Pinecone cleanup"
+                )
+                st.rerun()
+
+        # Show the status of this user's delete jobs
+        delete_jobs = [job for job in get_job_runner().list_jobs(st.session_state.username) if job['kind'] == "delete"]
+        if delete_jobs:
+            st.subheader("Deletions")
+            st.button("Refresh deletion status")
+            for job in delete_jobs:
+                if job['state'] == "failed":
+                    st.error(f"{job['description']} failed: {job['error']}")
+                    continue
+                statuses = job['progress'].get('packs')
+                if not statuses:
+                    st.info(f"{job['description']}: {job['state']}")
+                    continue
+                for pack_name, status in statuses.items():
+                    if status['state'] == "deleted" and status['vectors'] == "deleted":
+                        st.success(f"Deleted pack {pack_name}.")
+                    elif status['state'] == "deleted" and status['vectors'] == "pending":
+                        st.warning(f"Deleted pack {pack_name}; its Pinecone data will be removed on a retry.")
+                    elif status['state'] == "failed":
+                        st.error(f"Failed to delete pack {pack_name}: {status['error']}")
+                    else:
+                        st.info(f"Pack {pack_name}: {status['state']}, Pinecone data {status['vectors']}")
+
     else:
         st.write("Please select an action to proceed.")
 
@@ -366,14 +494,7 @@ def register_page():
             else:
                 try:
                     # Make a request to the Flask API to register a new user
-                    response = requests.post(
-                        f'{API_URL}/register',
-                        json={
-                            'username': username,
-                            'email': email,
-                            'password': password
-                        }
-                    )
+                    response = api_client.register(username, email, password)
                     
                     if response.status_code == 201:
                         st.success("Registration successful! You can now log in.")
@@ -411,102 +532,6 @@ def display_packs_with_delete():
     else:
         st.write("No packs available.")
 
-def format_data_for_pinecone(data):
-    formatted_data = []
-
-    # Check if data is a list of strings
-    if isinstance(data, list) and all(isinstance(item, str) for item in data):
-        for i, text in enumerate(data):
-            formatted_data.append({"id": f"vec{i+1}", "text": text})
-
-    # Check if data is a DataFrame
-    elif isinstance(data, pd.DataFrame):
-        # Replace 'your_text_column_name' with the actual column name containing text
-        text_column = 'your_text_column_name'
-        if text_column in data.columns:
-            for i, row in data.iterrows():
-                text = str(row[text_column])
-                formatted_data.append({"id": f"vec{i+1}", "text": text})
-        else:
-            # If the text column is not found, concatenate all columns
-            for i, row in data.iterrows():
-                text = ' '.join(str(value) for value in row.values)
-                formatted_data.append({"id": f"vec{i+1}", "text": text})
-    else:
-        logging.error("Unsupported data type for formatting.")
-
-    logging.info("Checking chunk sizes:")
-    for i, entry in enumerate(formatted_data):
-        text_size = len(entry['text'].encode('utf-8'))
-        logging.info("Chunk %d size: %d bytes", i+1, text_size)
-
-    return formatted_data
-
-def upload_to_pinecone(data, index_name):
-    logging.info("Uploading data to Pinecone with index name: %s", index_name)
-    logging.info("Data type before formatting: %s", type(data))
-    if isinstance(data, pd.DataFrame):
-        logging.info("Data content before formatting:\n%s", data.head())
-    else:
-        logging.info("Data content before formatting:\n%s", data)
-
-    # Format the data
-    formatted_data = format_data_for_pinecone(data)
-    logging.info("Formatted data: %s", formatted_data)
-
-    # Batch the data
-    batch_size = 96  # Maximum inputs per batch for the model
-    batches = [formatted_data[i:i + batch_size] for i in range(0, len(formatted_data), batch_size)]
-    logging.info("Total batches to upload: %d", len(batches))
-
-    # Initialize a session using Boto3
-    session = boto3.Session(
-        aws_access_key_id=os.getenv('ACCESS_KEY'),
-        aws_secret_access_key=os.getenv('SECRET_KEY'),
-        region_name=os.getenv('REGION')
-    )
-
-    # Create a Lambda client
-    lambda_client = session.client('lambda')
-
-    # Iterate over each batch and send to Lambda
-    for batch_number, batch_data in enumerate(batches, start=1):
-        logging.info("Uploading batch %d with %d records", batch_number, len(batch_data))
-
-        # Define the payload for the Lambda function with actual username
-        payload = {
-            "body": {
-                "action": "create_pack",
-                "username": st.session_state.username,  # Using actual username from session state
-                "data": batch_data,
-                "pack_name": index_name
-            }
-        }
-
-        # Invoke the Lambda function
-        try:
-            response = lambda_client.invoke(
-                FunctionName='pinecone-embedding-HelloWorldFunction-tHPspSqIP5SE',
-                InvocationType='RequestResponse',
-                Payload=json.dumps(payload)
-            )
-            logging.info("Lambda function invoked successfully for batch %d.", batch_number)
-
-            # Read the response
-            response_payload = json.loads(response['Payload'].read())
-            logging.info("Received response from Lambda for batch %d: %s", batch_number, response_payload)
-
-            # Check for errors in the response
-            if 'errorMessage' in response_payload:
-                logging.error("Error in Lambda invocation for batch %d: %s", batch_number, response_payload['errorMessage'])
-                return None
-
-        except Exception as e:
-            logging.error("Error invoking Lambda function for batch %d: %s", batch_number, e)
-            return None
-
-    return True  # Return True if all batches uploaded successfully
-
 # Display the appropriate page based on login state
 if st.session_state.logged_in:
     main_page()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manifest
+from ingest import run_ingest
+
+def test_trial_runs_leave_no_state_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'MANIFEST_DIR', str(tmp_path / 'manifests'))
+    source = tmp_path / 'customers.csv'
+    source.write_text("name,city\nAda,London\nGrace,NYC\nAlan,Wilmslow\n", encoding='utf-8')
+
+    for _ in range(2):
+        reports, _ = run_ingest([(str(source), 'customers')], 'user', processes=1, local_lambda=True)
+        assert [(report['records'], report['skipped'], report['error']) for report in reports] == [(3, 0, None)]
+    assert not (tmp_path / 'manifests').exists()
+
+    # With a state directory, a second trial run skips what the first uploaded
+    state_dir = str(tmp_path / 'state')
+    run_ingest([(str(source), 'customers')], 'user', processes=1, local_lambda=True, state_dir=state_dir)
+    reports, _ = run_ingest([(str(source), 'customers')], 'user', processes=1, local_lambda=True, state_dir=state_dir)
+    assert (reports[0]['records'], reports[0]['skipped']) == (0, 3)
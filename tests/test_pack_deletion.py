@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobRunner
+from local_lambda import LocalLambda
+from pack_deletion import retry_pending_deletions
+from upload_journal import UploadJournal
+
+class FlakyLambda(LocalLambda):
+    broken = ()
+
+    def handle(self, body):
+        if body['action'] == 'delete_pack' and body['pack_name'] in self.broken:
+            return {"errorMessage": "Service unavailable"}
+        return super().handle(body)
+
+def test_retry_pending_deletions_as_a_job(tmp_path):
+    journal = UploadJournal(str(tmp_path / 'journal.sqlite3'))
+    lambda_client = FlakyLambda()
+    for pack_name in ('old', 'stuck'):
+        lambda_client.handle({"action": "create_pack", "username": "user", "pack_name": pack_name,
+                              "data": [{"id": "a", "text": "text"}]})
+        journal.add_pending_deletion('user', pack_name)
+    lambda_client.broken = {'stuck'}
+
+    runner = JobRunner(workers=1)
+    job_id = runner.submit("delete", retry_pending_deletions, 'user', lambda_client=lambda_client, journal=journal,
+                           owner='user', description="Retry Pinecone cleanup")
+    runner.wait()
+    job = runner.status(job_id)
+
+    assert job['state'] == "succeeded" and job['result'] == ['stuck']
+    statuses = job['progress']['packs']
+    assert statuses['old'] == {"state": "deleted", "vectors": "deleted", "error": None}
+    assert statuses['stuck'] == {"state": "deleted", "vectors": "pending", "error": "Service unavailable"}
+    assert [pending['pack_name'] for pending in journal.pending_deletions('user')] == ['stuck']
+    assert lambda_client.records('user', 'old') == {}
@@ -0,0 +1,132 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import load_data
+import manifest
+import upload_data
+from local_lambda import LocalLambda
+from s3_ingest import ingest_s3_prefix, load_s3_object, list_s3_objects
+from upload_journal import UploadJournal
+
+mock_aws = pytest.importorskip('moto').mock_aws
+
+BUCKET = 'packman-test'
+
+def customers(rows, seed):
+    return pd.DataFrame({
+        'Customer Id': [f"c{seed}-{i}" for i in range(rows)],
+        'Company': [f"Company {seed}-{i % 7}" for i in range(rows)],
+        'City': [f"City {i % 11}" for i in range(rows)],
+    }).to_csv(index=False).encode('utf-8')
+
+@pytest.fixture
+def s3(monkeypatch):
+    import boto3
+
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        client = boto3.client('s3')
+        client.create_bucket(Bucket=BUCKET)
+        for day in range(2):
+            for part in range(3):
+                client.put_object(Bucket=BUCKET, Key=f"exports/day={day}/part-{part}.csv",
+                                  Body=customers(40, day * 10 + part))
+        client.put_object(Bucket=BUCKET, Key='exports/day=0/notes.jsonl',
+                          Body=b'{"text": "hello world"}\n{"text": "second line"}\n')
+        client.put_object(Bucket=BUCKET, Key='other/x.csv', Body=b'a,b\n1,2\n')
+        yield client
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'MANIFEST_DIR', str(tmp_path / 'manifests'))
+    return UploadJournal(str(tmp_path / 'journal.sqlite3'))
+
+def ingest(s3, journal, lambda_client, pattern, pack='pack'):
+    return ingest_s3_prefix(BUCKET, pattern, pack, 'user', lambda_client=lambda_client, s3_client=s3,
+                            journal=journal)
+
+def test_list_prefix_and_glob(s3):
+    assert len(list(list_s3_objects(BUCKET, 'exports/', s3))) == 7
+    assert len(list(list_s3_objects(BUCKET, 'exports/*/part-1.csv', s3))) == 2
+    assert len(list(list_s3_objects(BUCKET, '', s3))) == 8
+
+def test_ingest_prefix_rerun_and_deleted_object(s3, journal):
+    lambda_client = LocalLambda()
+
+    totals = ingest(s3, journal, lambda_client, 'exports/')
+    assert (totals['objects'], totals['uploaded'], totals['unchanged']) == (7, 7, 0)
+    assert not totals['failed'] and not totals['failed_objects']
+    assert totals['records_sent'] == 6 * 40 + 2
+    assert len(lambda_client.records('user', 'pack')) == 6 * 40 + 2
+
+    # Nothing changed: every object is skipped without being fetched
+    totals = ingest(s3, journal, lambda_client, 'exports/')
+    assert (totals['uploaded'], totals['unchanged'], totals['records_sent']) == (0, 7, 0)
+
+    # A deleted object's records are deleted from the pack
+    s3.delete_object(Bucket=BUCKET, Key='exports/day=1/part-2.csv')
+    totals = ingest(s3, journal, lambda_client, 'exports/')
+    assert (totals['objects'], totals['unchanged'], totals['removed'], totals['deleted']) == (6, 6, 1, 40)
+    assert len(lambda_client.records('user', 'pack')) == 5 * 40 + 2
+    assert 'exports/day=1/part-2.csv' not in journal.s3_objects('user', 'pack', BUCKET)
+
+def test_ingest_is_one_upload(s3, journal, monkeypatch):
+    saves = []
+    monkeypatch.setattr(upload_data, 'save_manifest', lambda data: saves.append(data) or manifest.save_manifest(data))
+    lambda_client = LocalLambda()
+
+    # Seven small objects share batches and the manifest is saved once
+    totals = ingest(s3, journal, lambda_client, 'exports/')
+    assert totals['uploaded'] == 7 and totals['total_batches'] == 3
+    assert len(saves) == 1 and len(saves[0]['sources']) == 7
+
+    s3.delete_object(Bucket=BUCKET, Key='exports/day=0/notes.jsonl')
+    s3.put_object(Bucket=BUCKET, Key='exports/day=0/part-0.csv', Body=customers(45, 0))
+    totals = ingest(s3, journal, lambda_client, 'exports/')
+    assert (totals['uploaded'], totals['removed'], totals['records_sent'], totals['deleted']) == (1, 1, 5, 2)
+    assert len(saves) == 2 and len(saves[1]['sources']) == 6
+    assert len(lambda_client.records('user', 'pack')) == 6 * 40 + 5
+
+def test_ingest_glob(s3, journal):
+    lambda_client = LocalLambda()
+
+    totals = ingest(s3, journal, lambda_client, 'exports/day=0/*.jsonl', pack='notes')
+    assert (totals['objects'], totals['uploaded'], totals['records_sent']) == (1, 1, 2)
+    assert sorted(lambda_client.records('user', 'notes').values()) == ['hello world', 'second line']
+
+    # Objects outside the glob are neither uploaded nor treated as removed
+    totals = ingest(s3, journal, lambda_client, 'exports/*/part-0.csv', pack='notes')
+    assert (totals['objects'], totals['uploaded'], totals['removed']) == (2, 2, 0)
+    assert len(lambda_client.records('user', 'notes')) == 2 + 2 * 40
+
+def test_ranged_fetch_reads_the_listed_version(s3, monkeypatch):
+    monkeypatch.setattr(load_data, 'S3_RANGE_THRESHOLD', 1)
+    monkeypatch.setattr(load_data, 'S3_RANGE_PART_SIZE', 256)
+
+    item = next(list_s3_objects(BUCKET, 'exports/day=0/part-0.csv', s3))
+    assert len(load_s3_object(BUCKET, item, s3)) == 40
+
+    # Overwritten after listing: the ranged reads must not mix in the new version
+    s3.put_object(Bucket=BUCKET, Key=item['key'], Body=customers(50, 99))
+    with pytest.raises(Exception, match='PreconditionFailed'):
+        load_s3_object(BUCKET, item, s3)
+
+def test_interleaved_ranged_streams_keep_their_own_bytes(s3, monkeypatch):
+    monkeypatch.setattr(load_data, 'S3_RANGE_THRESHOLD', 1)
+    monkeypatch.setattr(load_data, 'S3_RANGE_PART_SIZE', 64 * 1024)
+    # Large enough that pandas reads each stream in several pieces
+    s3.put_object(Bucket=BUCKET, Key='big/a.csv', Body=customers(30000, 1))
+    s3.put_object(Bucket=BUCKET, Key='big/b.csv', Body=customers(20000, 2))
+
+    first = load_data.load_s3_file_chunks(BUCKET, 'big/a.csv', chunksize=5000, s3_client=s3)
+    second = load_data.load_s3_file_chunks(BUCKET, 'big/b.csv', chunksize=5000, s3_client=s3)
+    next(first)
+    next(second)
+    ids = [id_ for chunk in first for id_ in chunk['Customer Id']]
+    assert len(ids) == 25000 and all(id_.startswith('c1-') for id_ in ids)
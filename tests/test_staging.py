@@ -0,0 +1,29 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from staging import StagingQuotaError, StagingStore
+
+class WatchedStore(StagingStore):
+    committed = 0
+
+    def _commit(self, session_dir, temp_path, path):
+        self.committed += 1
+        return super()._commit(session_dir, temp_path, path)
+
+def test_oversized_data_is_refused_before_it_is_written(tmp_path):
+    store = WatchedStore(str(tmp_path), session_quota=64 * 1024)
+
+    with pytest.raises(StagingQuotaError):
+        store.stage_file('session', memoryview(b'x' * (128 * 1024)), 'big.txt')
+    with pytest.raises(StagingQuotaError):
+        store.stage('session', pd.DataFrame({'text': ['y' * 1000] * 100}))
+    assert store.committed == 0
+    assert store.usage('session') == 0
+
+    staged = store.stage_file('session', b'a,b\n1,2\n', 'small.csv')
+    assert store.committed == 1
+    assert len(staged.head()) == 1
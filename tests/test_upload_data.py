@@ -0,0 +1,69 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manifest
+from local_lambda import LocalLambda
+from upload_data import upload_to_pinecone
+from upload_journal import UploadJournal
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'MANIFEST_DIR', str(tmp_path / 'manifests'))
+    return UploadJournal(str(tmp_path / 'journal.sqlite3'))
+
+def upload(data, journal, lambda_client, source, pack='pack'):
+    return upload_to_pinecone(data, pack, 'user', lambda_client=lambda_client, source=source, journal=journal)
+
+def test_first_upload_deletes_legacy_position_ids(journal):
+    lambda_client = LocalLambda()
+    # Vectors uploaded before content ids, with no manifest
+    frame = pd.DataFrame({'Name': [f"name {i}" for i in range(30)], 'City': ['Paris'] * 30})
+    lambda_client.handle({"action": "create_pack", "username": "user", "pack_name": "pack",
+                          "data": [{"id": f"vec{i + 1}", "text": f"old {i}"} for i in range(30)]})
+
+    summary = upload(frame, journal, lambda_client, 'file://customers.csv')
+    assert summary['legacy_deleted'] == 30
+    assert not any(id_.startswith('vec') for id_ in lambda_client.records('user', 'pack'))
+    assert len(lambda_client.records('user', 'pack')) == 30
+
+    # The source is migrated once; its later uploads leave vec ids alone
+    lambda_client.handle({"action": "create_pack", "username": "user", "pack_name": "pack",
+                          "data": [{"id": "vec1", "text": "another source"}]})
+    assert upload(frame, journal, lambda_client, 'file://customers.csv')['legacy_deleted'] == 0
+    assert 'vec1' in lambda_client.records('user', 'pack')
+
+def test_new_pack_skips_legacy_cleanup(journal):
+    lambda_client = LocalLambda()
+    manifest.start_manifest('user', 'fresh')
+    summary = upload(['first chunk', 'second chunk'], journal, lambda_client, 'web:https://example.com', 'fresh')
+    assert summary['legacy_deleted'] == 0 and summary['records_sent'] == 2
+
+def test_emoji_records_are_measured_and_split():
+    from upload_data import iter_fitting_records, record_payload_size
+
+    # Each emoji serializes as a 12-byte surrogate pair escape
+    record = {"id": "e" * 32, "text": "\U0001F600" * 90}
+    pieces = list(iter_fitting_records([record], max_bytes=783, oversized='split'))
+    assert len(pieces) > 1
+    assert all(record_payload_size(piece) <= 783 for piece in pieces)
+    assert ''.join(piece['text'] for piece in pieces) == record['text']
+
+def test_wire_format_is_negotiated_once_per_client(journal):
+    class CountingLambda(LocalLambda):
+        capability_calls = 0
+
+        def handle(self, body):
+            if body['action'] == 'capabilities':
+                self.capability_calls += 1
+            return super().handle(body)
+
+    lambda_client = CountingLambda()
+    for number in range(3):
+        summary = upload_to_pinecone([f"chunk {number}"], 'pack', 'user', lambda_client=lambda_client,
+                                     source=f"source {number}", wire_format='auto', journal=journal)
+        assert summary['wire_format'] == 'compact'
+    assert lambda_client.capability_calls == 1
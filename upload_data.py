@@ -0,0 +1,809 @@
+import hashlib
+import logging
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from dedup import DEDUP_GROUP_BYTES, NearDuplicateFilter
+from manifest import load_manifest, pack_lock, save_manifest, uploaded_ids
+from metrics import debug_sampled, get_metrics
+from upload_journal import batch_key, get_upload_journal
+from wire_format import WIRE_FORMAT_VERSION, encode_ids, encode_records
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Lambda function that embeds records and writes them to Pinecone
+LAMBDA_FUNCTION_NAME = 'pinecone-embedding-HelloWorldFunction-tHPspSqIP5SE'
+
+# Maximum inputs per batch for the model
+BATCH_SIZE = 96
+
+# Serialized payload budget per invocation. Synchronous Lambda requests are
+# capped at 6 MB; keep headroom for the invocation envelope.
+MAX_BATCH_BYTES = int(os.getenv('MAX_BATCH_BYTES', str(5 * 1024 * 1024)))
+
+# Hard limit on a synchronous Lambda request payload
+LAMBDA_PAYLOAD_LIMIT = 6 * 1024 * 1024
+
+# Payload encoding: 'json', 'compact' (see wire_format.py) or 'auto' to negotiate
+WIRE_FORMAT = os.getenv('WIRE_FORMAT', 'json')
+
+# Seconds a negotiated wire format is reused before the Lambda is asked again
+WIRE_FORMAT_TTL = int(os.getenv('WIRE_FORMAT_TTL', '3600'))
+
+# Compact payloads are compressed, so batches may hold this many times more
+# uncompressed bytes; parts that still end up too large are split before sending
+COMPACT_BATCH_EXPANSION = float(os.getenv('COMPACT_BATCH_EXPANSION', '3'))
+
+# What to do with a single record too large for one batch: 'split' or 'reject'
+OVERSIZED_RECORDS = os.getenv('OVERSIZED_RECORDS', 'split')
+
+# Maximum ids per delete_records call
+DELETE_BATCH_SIZE = 1000
+
+# Retries for throttled or transient Lambda failures, with exponential backoff
+MAX_RETRIES = int(os.getenv('MAX_RETRIES', '5'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+
+# Lambda error codes and function error messages that are worth retrying
+RETRYABLE_ERROR_CODES = {
+    'TooManyRequestsException', 'ThrottlingException', 'Throttling', 'RequestLimitExceeded',
+    'ServiceException', 'EC2ThrottledException', 'ENILimitReachedException', 'ResourceNotReadyException',
+}
+RETRYABLE_ERROR_MESSAGES = ('rate exceeded', 'too many requests', 'throttl', 'task timed out', '429', '503')
+
+# Maximum number of batches in flight at once
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '8'))
+
+_to_str = np.frompyfunc(str, 1, 1)
+
+# str() of every element of a NumPy array, as iterrows() rows would give it
+def _array_to_str(values):
+    if values.dtype.kind in 'iufbM':
+        return values.astype(str).astype(object)
+    if values.dtype.kind == 'O':
+        return _to_str(values).astype(object)
+    return np.array([str(value) for value in values], dtype=object)
+
+# str() of a NumPy-backed column once its values are boxed into Python
+# objects, which is what iterrows() rows hold when the frame mixes dtypes
+def _boxed_column_to_str(column):
+    values = column.to_numpy()
+    if values.dtype.kind in 'iub' or values.dtype == np.float64:
+        return _array_to_str(values)
+    if values.dtype == np.dtype('datetime64[ns]'):
+        # Timestamps without sub-second parts print as 'YYYY-MM-DD HH:MM:SS'
+        seconds = values.astype('datetime64[s]')
+        present = ~np.isnat(values)
+        if (values[present] == seconds[present]).all():
+            texts = np.char.replace(seconds.astype(str), 'T', ' ').astype(object)
+            texts[~present] = 'NaT'
+            return texts
+    return _to_str(column.astype(object).to_numpy()).astype(object)
+
+# Whether the frame mixes NumPy dtypes, so DataFrame.values (and with it every
+# iterrows() row) is upcast to object and can be formatted column by column
+def _is_mixed_numpy_frame(data):
+    dtypes = set(data.dtypes)
+    if not all(isinstance(dtype, np.dtype) for dtype in dtypes):
+        return False
+    kinds = {dtype.kind for dtype in dtypes}
+    return len(dtypes) > 1 and not kinds <= set('iuf')
+
+# Build record ids and texts for a DataFrame in bulk
+def format_dataframe_columns(data, text_columns=None, separator=' '):
+    if text_columns:
+        data = data[list(text_columns)]
+
+    # Ids follow the DataFrame index, like iterrows() did
+    if pd.api.types.is_integer_dtype(data.index):
+        positions = np.asarray(data.index) + 1
+    else:
+        positions = np.arange(1, len(data) + 1)
+    ids = 'vec' + positions.astype(str).astype(object)
+
+    if data.shape[1] == 0:
+        return ids, np.full(len(data), '', dtype=object)
+
+    if _is_mixed_numpy_frame(data):
+        columns = (_boxed_column_to_str(data.iloc[:, j]) for j in range(data.shape[1]))
+    else:
+        # .values upcasts to a common dtype exactly as iterrows() rows do
+        values = data.values
+        columns = (_array_to_str(values[:, j]) for j in range(values.shape[1]))
+
+    texts = next(columns)
+    for column in columns:
+        texts = texts + separator + column
+
+    return ids, texts
+
+# Deterministic record id derived from the record text, so the same chunk
+# always maps to the same vector
+def content_record_id(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+# Format data into records for Pinecone. With id_scheme='position', DataFrame
+# ids follow the index and lists of strings are numbered after start, the count
+# of earlier strings from the same source. With id_scheme='content', ids are
+# hashes of the record text, and the position ids they replace are added to
+# position_ids when given.
+def format_data_for_pinecone(data, text_columns=None, separator=' ', start=0, id_scheme='position',
+                             position_ids=None):
+    formatted_data = []
+
+    # Check if data is a list of strings
+    if isinstance(data, list) and all(isinstance(item, str) for item in data):
+        for i, text in enumerate(data):
+            formatted_data.append({"id": f"vec{start+i+1}", "text": text})
+
+    # Check if data is a DataFrame
+    elif isinstance(data, pd.DataFrame):
+        # Use the chosen text columns, or concatenate all columns
+        missing = [column for column in (text_columns or []) if column not in data.columns]
+        if missing:
+            logging.warning("Text columns not found, using all columns instead: %s", missing)
+            text_columns = None
+        ids, texts = format_dataframe_columns(data, text_columns, separator)
+        formatted_data = [{"id": id_, "text": text} for id_, text in zip(ids.tolist(), texts.tolist())]
+    else:
+        logging.error("Unsupported data type for formatting.")
+
+    if id_scheme == 'content':
+        if position_ids is not None:
+            position_ids.update(entry['id'] for entry in formatted_data)
+        for entry in formatted_data:
+            entry['id'] = content_record_id(entry['text'])
+
+    # Only chunks that could be over budget are measured
+    for i, entry in enumerate(formatted_data):
+        if _may_exceed(entry, MAX_BATCH_BYTES) and record_payload_size(entry) > MAX_BATCH_BYTES:
+            logging.warning("Chunk %d is larger than the %d-byte batch budget.", i+1, MAX_BATCH_BYTES)
+    debug_sampled('formatted_chunk', "Formatted %d records, first: %s", len(formatted_data), formatted_data[:1])
+
+    return formatted_data
+
+# Bytes a record adds to the JSON payload sent to Lambda
+def record_payload_size(record):
+    return len(json.dumps(record))
+
+# Cheap upper bound check: JSON escapes a character to at most 12 bytes (a
+# \uXXXX surrogate pair for characters outside the BMP, such as emoji), so
+# only records that could pass the limit need to be serialized to measure them
+def _may_exceed(record, limit):
+    return (len(record['text']) + len(record['id'])) * 12 + 32 > limit
+
+# Bytes the invocation envelope adds around the records of a batch
+def payload_overhead(username, index_name):
+    return len(json.dumps({
+        "body": {
+            "action": "create_pack",
+            "username": username,
+            "data": [],
+            "pack_name": index_name
+        }
+    }))
+
+# Split an oversized record into pieces that each fit in max_bytes. Piece ids
+# extend the record id, so they stay deterministic.
+def split_oversized_record(record, max_bytes):
+    text = record['text']
+    pieces = []
+    start = 0
+    while start < len(text):
+        length = len(text) - start
+        while True:
+            piece = {"id": f"{record['id']}-{len(pieces) + 1}", "text": text[start:start + length]}
+            size = record_payload_size(piece)
+            if size <= max_bytes or length == 1:
+                break
+            # Shrink in proportion to the overshoot
+            length = max(1, min(length - 1, length * max_bytes // size))
+        pieces.append(piece)
+        start += length
+    return pieces
+
+# Make every record fit in one batch of max_bytes, splitting or rejecting the
+# ones that do not according to oversized. Counts go into stats.
+def iter_fitting_records(records, max_bytes=MAX_BATCH_BYTES, oversized=OVERSIZED_RECORDS, stats=None):
+    stats = stats if stats is not None else new_batch_stats()
+    for record in records:
+        if not _may_exceed(record, max_bytes) or record_payload_size(record) <= max_bytes:
+            yield record
+        elif oversized == 'split':
+            pieces = split_oversized_record(record, max_bytes)
+            logging.warning("Split oversized record %s into %d pieces.", record['id'], len(pieces))
+            stats['split_records'] += 1
+            yield from pieces
+        else:
+            logging.error("Rejected record %s: larger than the %d-byte batch budget.", record['id'], max_bytes)
+            stats['rejected_records'] += 1
+            stats['rejected_ids'].append(record['id'])
+
+# Create a Lambda client from the AWS credentials in the environment. boto3 is
+# imported here so the app starts without loading it.
+def create_lambda_client():
+    import boto3
+
+    session = boto3.Session(
+        aws_access_key_id=os.getenv('ACCESS_KEY'),
+        aws_secret_access_key=os.getenv('SECRET_KEY'),
+        region_name=os.getenv('REGION')
+    )
+    return session.client('lambda')
+
+_default_lambda_client = None
+_default_lambda_client_lock = threading.Lock()
+
+# Lambda client shared by every upload in this process. boto3 clients are
+# thread-safe, so one client serves all sessions and upload workers.
+def get_lambda_client():
+    global _default_lambda_client
+    with _default_lambda_client_lock:
+        if _default_lambda_client is None:
+            _default_lambda_client = create_lambda_client()
+        return _default_lambda_client
+
+# Wire formats negotiated per Lambda client, with the time they were asked
+_negotiated_formats = weakref.WeakKeyDictionary()
+_negotiated_formats_lock = threading.Lock()
+
+# Pick the payload encoding: 'json', 'compact', or 'auto' to use the compact
+# format only when the Lambda reports it can read this version. The answer is
+# kept per client for WIRE_FORMAT_TTL seconds, so uploads do not each ask.
+def negotiate_wire_format(lambda_client, requested=WIRE_FORMAT):
+    if requested != 'auto':
+        return requested
+    with _negotiated_formats_lock:
+        cached = _negotiated_formats.get(lambda_client)
+    if cached is not None and time.monotonic() - cached[1] < WIRE_FORMAT_TTL:
+        return cached[0]
+    try:
+        response = lambda_client.invoke(
+            FunctionName=LAMBDA_FUNCTION_NAME,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({"body": {"action": "capabilities"}})
+        )
+        response_payload = json.loads(response['Payload'].read())
+    except Exception as e:
+        # Not cached, so the next upload asks again
+        logging.warning("Could not negotiate wire format, using JSON: %s", e)
+        return 'json'
+    wire_format = 'json'
+    if WIRE_FORMAT_VERSION in response_payload.get('wire_versions', []):
+        logging.info("Lambda accepts wire format version %d; using compact payloads.", WIRE_FORMAT_VERSION)
+        wire_format = 'compact'
+    with _negotiated_formats_lock:
+        _negotiated_formats[lambda_client] = (wire_format, time.monotonic())
+    return wire_format
+
+# Serialize the create_pack payloads for a batch. A compact payload is measured
+# after compression, and the batch is halved until every part fits the
+# Lambda request limit.
+def build_create_payloads(batch_data, username, index_name, wire_format='json'):
+    if wire_format == 'compact':
+        body = {"action": "create_pack", "username": username, "pack_name": index_name}
+        body.update(encode_records(batch_data))
+    else:
+        body = {"action": "create_pack", "username": username, "data": batch_data, "pack_name": index_name}
+    payload = json.dumps({"body": body})
+    if wire_format == 'compact' and len(payload) > LAMBDA_PAYLOAD_LIMIT and len(batch_data) > 1:
+        middle = len(batch_data) // 2
+        return (build_create_payloads(batch_data[:middle], username, index_name, wire_format)
+                + build_create_payloads(batch_data[middle:], username, index_name, wire_format))
+    return [payload]
+
+# Whether a failed invocation is worth retrying: Lambda throttling, service
+# and connection errors, or a function error reporting throttling or a timeout
+def is_retryable(error=None, error_message=None):
+    from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES
+    if isinstance(error, (BotoConnectionError, ReadTimeoutError)):
+        return True
+    if error_message is not None:
+        lowered = str(error_message).lower()
+        return any(marker in lowered for marker in RETRYABLE_ERROR_MESSAGES)
+    return False
+
+# Seconds to wait before retry number attempt: exponential backoff with full jitter
+def backoff_delay(attempt):
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+# Invoke the Lambda synchronously and return the decoded response payload,
+# retrying throttled and transient failures with backoff. Raises the last
+# error, or returns the last error payload, once retries run out.
+def invoke_with_retry(lambda_client, payload, description, max_retries=MAX_RETRIES):
+    metrics = get_metrics()
+    attempt = 0
+    while True:
+        try:
+            with metrics.timer('lambda_invoke_seconds'):
+                response = lambda_client.invoke(
+                    FunctionName=LAMBDA_FUNCTION_NAME,
+                    InvocationType='RequestResponse',
+                    Payload=payload
+                )
+                response_payload = json.loads(response['Payload'].read())
+            if 'errorMessage' not in response_payload:
+                return response_payload
+            metrics.increment('lambda_errors_total')
+            if attempt >= max_retries or not is_retryable(error_message=response_payload['errorMessage']):
+                return response_payload
+            logging.warning("Retryable error for %s: %s", description, response_payload['errorMessage'])
+        except Exception as e:
+            metrics.increment('lambda_errors_total')
+            if attempt >= max_retries or not is_retryable(error=e):
+                raise
+            logging.warning("Retryable error for %s: %s", description, e)
+        delay = backoff_delay(attempt)
+        attempt += 1
+        metrics.increment('lambda_retries_total')
+        logging.info("Retrying %s in %.2f seconds (attempt %d of %d).", description, delay, attempt, max_retries)
+        time.sleep(delay)
+
+# Send one batch to Lambda and return its outcome
+def invoke_batch(lambda_client, batch_number, batch_data, username, index_name, wire_format='json'):
+    logging.info("Uploading batch %d with %d records", batch_number, len(batch_data))
+    metrics = get_metrics()
+    ids = [record['id'] for record in batch_data]
+
+    try:
+        # Define the payload for the Lambda function with actual username
+        payloads = build_create_payloads(batch_data, username, index_name, wire_format)
+        for payload in payloads:
+            response_payload = invoke_with_retry(lambda_client, payload, f"batch {batch_number}")
+            logging.info("Received response from Lambda for batch %d: %s", batch_number, response_payload)
+
+            # Check for errors in the response
+            if 'errorMessage' in response_payload:
+                logging.error("Error in Lambda invocation for batch %d: %s", batch_number, response_payload['errorMessage'])
+                metrics.increment('batches_total', status='failed')
+                metrics.increment('records_failed_total', len(batch_data))
+                return {"batch": batch_number, "records": len(batch_data), "ids": ids, "ok": False, "error": response_payload['errorMessage']}
+
+        sent_bytes = sum(len(payload) for payload in payloads)
+        metrics.increment('batches_total', status='ok')
+        metrics.increment('records_sent_total', len(batch_data))
+        metrics.increment('bytes_sent_total', sent_bytes)
+        return {"batch": batch_number, "records": len(batch_data), "ids": ids, "ok": True, "response": response_payload,
+                "bytes": sent_bytes}
+
+    except Exception as e:
+        logging.error("Error invoking Lambda function for batch %d: %s", batch_number, e)
+        metrics.increment('batches_total', status='failed')
+        metrics.increment('records_failed_total', len(batch_data))
+        return {"batch": batch_number, "records": len(batch_data), "ids": ids, "ok": False, "error": str(e)}
+
+# Ask Lambda to delete records from a pack. Returns the ids that could not be deleted.
+def delete_records(lambda_client, ids, username, index_name, batch_size=DELETE_BATCH_SIZE, wire_format='json'):
+    failed = set()
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        if wire_format == 'compact':
+            body = {"action": "delete_records", "username": username, "pack_name": index_name}
+            body.update(encode_ids(batch_ids))
+        else:
+            body = {"action": "delete_records", "username": username, "ids": batch_ids, "pack_name": index_name}
+        try:
+            response_payload = invoke_with_retry(lambda_client, json.dumps({"body": body}), f"delete from {index_name}")
+            if 'errorMessage' in response_payload:
+                logging.error("Error deleting %d records from %s: %s", len(batch_ids), index_name, response_payload['errorMessage'])
+                failed.update(batch_ids)
+            else:
+                logging.info("Deleted %d records from %s.", len(batch_ids), index_name)
+        except Exception as e:
+            logging.error("Error invoking Lambda function to delete records from %s: %s", index_name, e)
+            failed.update(batch_ids)
+    metrics = get_metrics()
+    metrics.increment('records_deleted_total', len(ids) - len(failed))
+    metrics.increment('records_delete_failed_total', len(failed))
+    return failed
+
+# Format a stream of data chunks (DataFrames or lists of strings) so record ids
+# match a single read of the whole source. read_csv chunks carry a continuing
+# RangeIndex, and string chunks are numbered after the strings before them.
+def iter_formatted_records(chunks, text_columns=None, separator=' ', id_scheme='position', position_ids=None):
+    metrics = get_metrics()
+    offset = 0
+    for chunk in chunks:
+        with metrics.timer('stage_seconds', stage='format'):
+            formatted_data = format_data_for_pinecone(chunk, text_columns, separator, start=offset, id_scheme=id_scheme,
+                                                      position_ids=position_ids)
+        metrics.increment('records_formatted_total', len(formatted_data))
+        if isinstance(chunk, list):
+            offset += len(formatted_data)
+        yield from formatted_data
+
+# Drop records the pack already holds or that repeat earlier content. Every id
+# of the source is added to source_ids, whether it is sent or not. With a
+# NearDuplicateFilter, records nearly the same as an earlier record of the
+# source are dropped too and left out of source_ids; they are checked before
+# already uploaded records are skipped, so a re-run drops the same records.
+def iter_new_records(records, already_uploaded, source_ids, stats=None, near_duplicates=None):
+    if near_duplicates is None:
+        for record in records:
+            if record['id'] in source_ids:
+                if stats is not None:
+                    stats['duplicate_records'] += 1
+                continue
+            source_ids.add(record['id'])
+            if record['id'] not in already_uploaded:
+                yield record
+        return
+
+    for group in _text_groups(records):
+        distinct = []
+        for record in group:
+            if record['id'] in source_ids:
+                if stats is not None:
+                    stats['duplicate_records'] += 1
+                continue
+            source_ids.add(record['id'])
+            distinct.append(record)
+        flags = near_duplicates.check_many([record['text'] for record in distinct])
+        for record, near_duplicate in zip(distinct, flags):
+            if near_duplicate:
+                source_ids.discard(record['id'])
+                if stats is not None:
+                    stats['near_duplicate_records'] += 1
+            elif record['id'] not in already_uploaded:
+                yield record
+
+# Records in groups of about DEDUP_GROUP_BYTES of text, so near-duplicate
+# signatures are computed many records at a time
+def _text_groups(records):
+    group, group_bytes = [], 0
+    for record in records:
+        group.append(record)
+        group_bytes += len(record['text'])
+        if group_bytes >= DEDUP_GROUP_BYTES:
+            yield group
+            group, group_bytes = [], 0
+    if group:
+        yield group
+
+# Empty batch statistics, filled in by iter_fitting_records and iter_batches
+def new_batch_stats():
+    return {
+        "batches": 0,
+        "records": 0,
+        "bytes": 0,
+        "min_records": None,
+        "max_records": 0,
+        "min_bytes": None,
+        "max_bytes": 0,
+        "split_records": 0,
+        "rejected_records": 0,
+        "rejected_ids": [],
+        "duplicate_records": 0,
+        "near_duplicate_records": 0,
+    }
+
+def _record_batch(stats, records, size):
+    stats['batches'] += 1
+    stats['records'] += records
+    stats['bytes'] += size
+    stats['min_records'] = records if stats['min_records'] is None else min(stats['min_records'], records)
+    stats['max_records'] = max(stats['max_records'], records)
+    stats['min_bytes'] = size if stats['min_bytes'] is None else min(stats['min_bytes'], size)
+    stats['max_bytes'] = max(stats['max_bytes'], size)
+
+# Group a stream of records into ready-to-send batches of at most batch_size
+# records whose serialized payload, including overhead bytes of envelope, stays
+# within max_bytes. Records are expected to fit on their own (see
+# iter_fitting_records); a record that does not is sent in a batch by itself.
+def iter_batches(records, batch_size=BATCH_SIZE, max_bytes=MAX_BATCH_BYTES, overhead=0, stats=None):
+    batch_data = []
+    batch_bytes = overhead
+    for record in records:
+        # Each record after the first is preceded by the ', ' list separator
+        size = record_payload_size(record) + (2 if batch_data else 0)
+        if batch_data and (len(batch_data) >= batch_size or batch_bytes + size > max_bytes):
+            if stats is not None:
+                _record_batch(stats, len(batch_data), batch_bytes)
+            yield batch_data
+            batch_data = []
+            batch_bytes = overhead
+            size -= 2
+        batch_data.append(record)
+        batch_bytes += size
+    if batch_data:
+        if stats is not None:
+            _record_batch(stats, len(batch_data), batch_bytes)
+        yield batch_data
+
+# Summarize batch statistics for logs and run summaries
+def summarize_batch_stats(stats):
+    summary = {key: value for key, value in stats.items() if key != 'rejected_ids'}
+    if stats['batches']:
+        summary['avg_records'] = stats['records'] / stats['batches']
+        summary['avg_bytes'] = stats['bytes'] / stats['batches']
+    return summary
+
+# Send a stream of batches to Lambda over a bounded worker pool. Only a small
+# window of batches is held in memory at once, and results stay in batch order.
+#
+# With a journal, every delivered batch is checkpointed under upload_id, and
+# batches the journal already holds (same number, same record ids) are not sent again.
+def upload_batches(batches, index_name, username, lambda_client=None, max_workers=UPLOAD_CONCURRENCY, wire_format='json',
+                   progress=None, upload_id=None, journal=None):
+    if lambda_client is None:
+        lambda_client = get_lambda_client()
+
+    max_workers = max(1, max_workers)
+    results = []
+    counts = {"batches_done": 0, "batches_failed": 0, "records_sent": 0}
+    completed = journal.completed_batches(upload_id) if journal is not None else {}
+    if completed:
+        logging.info("Resuming upload %s: %d batches already delivered.", upload_id, len(completed))
+
+    def collect(result):
+        results.append(result)
+        if journal is not None and result['ok'] and not result.get('resumed'):
+            journal.mark_batch_done(upload_id, result['batch'], batch_key(result['ids']))
+        if progress is not None:
+            counts['batches_done'] += 1
+            counts['batches_failed'] += 0 if result['ok'] else 1
+            counts['records_sent'] += result['records'] if result['ok'] else 0
+            progress(dict(counts))
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch_number, batch_data in enumerate(batches, start=1):
+            ids = [record['id'] for record in batch_data]
+            if completed and completed.get(batch_number) == batch_key(ids):
+                # Delivered by an earlier attempt of this upload
+                future = Future()
+                future.set_result({"batch": batch_number, "records": len(batch_data), "ids": ids, "ok": True, "resumed": True})
+                pending.append(future)
+            else:
+                pending.append(executor.submit(invoke_batch, lambda_client, batch_number, batch_data, username, index_name, wire_format))
+            if len(pending) >= max_workers * 2:
+                collect(pending.popleft().result())
+        while pending:
+            collect(pending.popleft().result())
+
+    failed = [result for result in results if not result['ok']]
+    summary = {
+        "index_name": index_name,
+        "total_batches": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": failed,
+        "results": results,
+    }
+    if failed:
+        logging.error("Upload to %s finished with %d of %d batches failed: %s",
+                      index_name, len(failed), len(results), [result['batch'] for result in failed])
+    else:
+        logging.info("Upload to %s finished: all %d batches succeeded.", index_name, len(results))
+
+    return summary
+
+# Chunks of data: a DataFrame or list of strings is one chunk, anything else
+# an iterable of them
+def _data_chunks(data):
+    if isinstance(data, pd.DataFrame):
+        debug_sampled('upload_data', "Data content before formatting:\n%s", data.head())
+        return [data]
+    if isinstance(data, list):
+        debug_sampled('upload_data', "Data content before formatting:\n%s", data[:5])
+        return [data]
+    return data
+
+# Upload data to Pinecone, dispatching batches to Lambda concurrently. data is a
+# DataFrame, a list of strings, or an iterable of such chunks (for example from
+# load_csv_chunks) that is formatted and sent without loading it all at once.
+#
+# Record ids are content hashes, and a local manifest per pack remembers which
+# ids were uploaded from which source, so only new or changed chunks are sent.
+# When source is given, chunks it no longer contains are deleted from the pack
+# unless another source still holds them. Repeated chunks are sent once, and
+# with a dedup_threshold (e.g. DEDUP_THRESHOLD) chunks whose similarity to an
+# earlier chunk of the source reaches it are dropped as near duplicates.
+#
+# Batches hold at most BATCH_SIZE records and max_batch_bytes of serialized
+# payload; records too large for any batch are split or rejected per oversized.
+# wire_format picks plain JSON, the compact encoding, or 'auto' negotiation.
+# progress, if given, is called with running batch and record counts.
+#
+# Delivered batches are checkpointed in the upload journal under upload_id (a
+# new id by default), so an interrupted upload can continue with resume_upload.
+# Returns a summary of the run with per-batch results in batch order.
+def upload_to_pinecone(data, index_name, username, lambda_client=None, max_workers=UPLOAD_CONCURRENCY,
+                       text_columns=None, separator=' ', source=None, delete_removed=True,
+                       max_batch_bytes=MAX_BATCH_BYTES, oversized=OVERSIZED_RECORDS, wire_format=WIRE_FORMAT,
+                       dedup_threshold=None, progress=None, upload_id=None, journal=None):
+    logging.info("Uploading data to Pinecone with index name: %s", index_name)
+    logging.info("Data type before formatting: %s", type(data))
+    summary = upload_sources([(source, data)], index_name, username, lambda_client, max_workers, text_columns,
+                             separator, delete_removed, max_batch_bytes, oversized, wire_format, dedup_threshold,
+                             progress, upload_id, journal, upload_source=source)
+    del summary['sources']
+    return summary
+
+# Upload several sources to a pack as one stream of batches, as
+# upload_to_pinecone does for one. sources yields (source, data) pairs and is
+# consumed lazily, in order, while batches go out, so small sources share
+# batches and the pack's manifest is loaded and saved once rather than once per
+# source. Each source's records are tracked under it: a chunk a source drops is
+# deleted only if no source holds it afterwards, and an empty list as data
+# deletes all of a source's chunks. upload_source names the whole upload in the
+# journal. The summary adds 'sources', mapping each source key ('' for None)
+# to its record count, how many of its records failed to upload, and its
+# deleted and delete-failed counts.
+def upload_sources(sources, index_name, username, lambda_client=None, max_workers=UPLOAD_CONCURRENCY,
+                   text_columns=None, separator=' ', delete_removed=True, max_batch_bytes=MAX_BATCH_BYTES,
+                   oversized=OVERSIZED_RECORDS, wire_format=WIRE_FORMAT, dedup_threshold=None, progress=None,
+                   upload_id=None, journal=None, upload_source=None):
+    metrics = get_metrics()
+
+    if lambda_client is None:
+        lambda_client = get_lambda_client()
+
+    journal = journal or get_upload_journal()
+    upload_id = upload_id or uuid.uuid4().hex
+    journal.start_upload(upload_id, username, index_name, upload_source, {
+        "text_columns": text_columns,
+        "separator": separator,
+        "delete_removed": delete_removed,
+        "max_batch_bytes": max_batch_bytes,
+        "oversized": oversized,
+        "wire_format": wire_format,
+        "dedup_threshold": dedup_threshold,
+    })
+
+    wire_format = negotiate_wire_format(lambda_client, wire_format)
+    batch_budget = max_batch_bytes * COMPACT_BATCH_EXPANSION if wire_format == 'compact' else max_batch_bytes
+
+    # Uploads to the same pack run one at a time: each reads the manifest, uploads
+    # and saves it with its sources updated
+    with pack_lock(username, index_name):
+        manifest = load_manifest(username, index_name)
+        # Ids the pack holds; each source's ids are added once it is read, so a
+        # chunk shared with an earlier source of this upload is sent once
+        known_ids = uploaded_ids(manifest)
+        stats = new_batch_stats()
+        overhead = payload_overhead(username, index_name)
+        tracked = {}
+
+        def iter_source_records():
+            for source, data in sources:
+                source_key = source or ''
+                entry = tracked.setdefault(source_key, {"source": source, "ids": set(), "legacy": None})
+                # Packs from before content ids hold vecN ids that no manifest lists;
+                # the first upload of each source collects the ones it replaces
+                if manifest.get('legacy') and source_key not in manifest.get('migrated', []):
+                    entry['legacy'] = entry['legacy'] if entry['legacy'] is not None else set()
+                # Each stage is timed exclusively: 'batch' covers fitting, filtering and batching
+                chunks = metrics.timed_iter(_data_chunks(data), 'stage_seconds', stage='load')
+                records = iter_formatted_records(chunks, text_columns, separator, id_scheme='content',
+                                                 position_ids=entry['legacy'])
+                fitting_records = iter_fitting_records(records, max_batch_bytes - overhead, oversized, stats)
+                near_duplicates = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+                yield from iter_new_records(fitting_records, known_ids, entry['ids'], stats, near_duplicates)
+                known_ids.update(entry['ids'])
+
+        # Format, fit, filter and batch the data lazily, chunk by chunk
+        batches = metrics.timed_iter(iter_batches(iter_source_records(), BATCH_SIZE, batch_budget, overhead, stats),
+                                     'stage_seconds', stage='batch')
+        summary = upload_batches(batches, index_name, username, lambda_client, max_workers, wire_format, progress,
+                                 upload_id, journal)
+        summary['upload_id'] = upload_id
+        summary['wire_format'] = wire_format
+        summary['bytes_sent'] = sum(result.get('bytes', 0) for result in summary['results'])
+        summary['batch_stats'] = summarize_batch_stats(stats)
+        summary['rejected'] = stats['rejected_ids']
+        summary['duplicates'] = stats['duplicate_records']
+        summary['near_duplicates'] = stats['near_duplicate_records']
+        logging.info("Batch statistics for %s: %s", index_name, summary['batch_stats'])
+
+        failed_ids = {id_ for result in summary['failed'] for id_ in result['ids']}
+        sent = sum(result['records'] for result in summary['results'])
+        summary['records_sent'] = sent - sum(result['records'] for result in summary['failed'])
+        summary['skipped'] = sum(len(entry['ids']) for entry in tracked.values()) - sent
+        logging.info("Skipped %d records already in pack %s.", summary['skipped'], index_name)
+        logging.info("Removed %d duplicate and %d near-duplicate records.", summary['duplicates'],
+                     summary['near_duplicates'])
+
+        # What each source holds now. Failed uploads are left out so they are sent
+        # again next time; a source without a name only ever adds chunks.
+        current, dropped = {}, {}
+        for source_key, entry in tracked.items():
+            previous_ids = set(manifest['sources'].get(source_key, []))
+            current[source_key] = entry['ids'] - failed_ids
+            if entry['source'] is None:
+                current[source_key] |= previous_ids
+            dropped[source_key] = previous_ids - entry['ids'] if entry['source'] is not None else set()
+
+        # Delete chunks sources no longer have, unless a source still holds them
+        held_ids = uploaded_ids({"sources": dict(manifest['sources'], **current)})
+        removed = set().union(*dropped.values()) - held_ids
+        delete_failed = set()
+        if removed and delete_removed:
+            delete_failed = delete_records(lambda_client, sorted(removed), username, index_name,
+                                           wire_format=wire_format)
+        elif removed:
+            delete_failed = set(removed)
+        summary['deleted'] = len(removed) - len(delete_failed)
+        summary['delete_failed'] = sorted(delete_failed)
+
+        # Once all of a source's records are uploaded under their content ids,
+        # delete the legacy ids they replace; a failed upload or delete leaves
+        # them for next time
+        migrating = {source_key: entry['legacy'] for source_key, entry in tracked.items()
+                     if entry['legacy'] is not None and not entry['ids'] & failed_ids}
+        legacy_ids = set().union(*migrating.values())
+        legacy_failed = delete_records(lambda_client, sorted(legacy_ids), username, index_name,
+                                       wire_format=wire_format) if legacy_ids else set()
+        summary['legacy_deleted'] = len(legacy_ids) - len(legacy_failed)
+        if legacy_ids:
+            logging.info("Deleted %d legacy position ids from pack %s.", summary['legacy_deleted'], index_name)
+        for source_key, ids in migrating.items():
+            if not ids & legacy_failed:
+                manifest.setdefault('migrated', []).append(source_key)
+
+        # Remember what the pack now holds from each source; failed deletes are
+        # kept so they are retried
+        summary['sources'] = {}
+        for source_key, entry in tracked.items():
+            source_removed = dropped[source_key] & removed
+            current[source_key] |= source_removed & delete_failed
+            if current[source_key] or entry['source'] is None:
+                manifest['sources'][source_key] = sorted(current[source_key])
+            else:
+                manifest['sources'].pop(source_key, None)
+            summary['sources'][source_key] = {
+                "records": len(entry['ids']),
+                "failed": len(entry['ids'] & failed_ids),
+                "deleted": len(source_removed - delete_failed),
+                "delete_failed": len(source_removed & delete_failed),
+            }
+        save_manifest(manifest)
+    journal.finish_upload(upload_id, completed=not summary['failed'])
+
+    metrics.increment('records_skipped_total', summary['skipped'])
+    metrics.increment('records_rejected_total', len(summary['rejected']))
+    metrics.increment('records_duplicate_total', summary['duplicates'], kind='exact')
+    metrics.increment('records_duplicate_total', summary['near_duplicates'], kind='near')
+    metrics.increment('uploads_total', status='failed' if summary['failed'] else 'ok')
+    metrics.flush()
+
+    return summary
+
+# An upload summary without the ids and Lambda response of every batch, for
+# keeping once the upload is done, e.g. as a job's result. Failed batches keep
+# their number and error, and lists of record ids become counts.
+def slim_summary(summary):
+    slim = {key: value for key, value in summary.items()
+            if key not in ('results', 'failed', 'rejected', 'delete_failed')}
+    slim['failed'] = [{key: result[key] for key in ('batch', 'records', 'error', 'source') if key in result}
+                      for result in summary['failed']]
+    for key in ('rejected', 'delete_failed'):
+        if key in summary:
+            slim[key] = len(summary[key])
+    return slim
+
+# Continue an upload that was interrupted or finished with failed batches. data
+# must be the same source data; batches the journal shows as delivered are skipped.
+def resume_upload(upload_id, data, lambda_client=None, max_workers=UPLOAD_CONCURRENCY, progress=None, journal=None):
+    journal = journal or get_upload_journal()
+    upload = journal.get_upload(upload_id)
+    if upload is None:
+        logging.error("No upload %s in the journal to resume.", upload_id)
+        return None
+
+    logging.info("Resuming upload %s of %s to pack %s.", upload_id, upload['source'], upload['pack_name'])
+    return upload_to_pinecone(data, upload['pack_name'], upload['username'], lambda_client, max_workers,
+                              source=upload['source'], progress=progress, upload_id=upload_id, journal=journal,
+                              **upload['params'])
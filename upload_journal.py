@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# SQLite file recording which batches of each upload have been delivered
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', os.path.join(os.path.expanduser('~'), '.packman', 'uploads.sqlite3'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    pack_name TEXT NOT NULL,
+    source TEXT,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    upload_id TEXT NOT NULL,
+    batch_number INTEGER NOT NULL,
+    batch_key TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (upload_id, batch_number)
+);
+CREATE TABLE IF NOT EXISTS pending_deletions (
+    username TEXT NOT NULL,
+    pack_name TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (username, pack_name)
+);
+CREATE TABLE IF NOT EXISTS s3_objects (
+    username TEXT NOT NULL,
+    pack_name TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    object_key TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    params TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (username, pack_name, bucket, object_key)
+);
+"""
+
+# Fingerprint of a batch's record ids, so a resumed upload only skips a batch
+# number when it holds exactly the records that were delivered before
+def batch_key(ids):
+    return hashlib.sha256('\n'.join(ids).encode('utf-8')).hexdigest()
+
+# Durable checkpoint journal of uploads and their completed batches
+class UploadJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _execute(self, sql, parameters=()):
+        with self._lock, closing(self._connect()) as connection, connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    # Register an upload and the parameters needed to resume it
+    def start_upload(self, upload_id, username, pack_name, source, params):
+        now = time.time()
+        self._execute(
+            "INSERT INTO uploads (upload_id, username, pack_name, source, params, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'running', ?, ?) "
+            "ON CONFLICT(upload_id) DO UPDATE SET state = 'running', updated_at = excluded.updated_at",
+            (upload_id, username, pack_name, source, json.dumps(params), now, now)
+        )
+
+    # Upload row as a dict, or None if the journal has never seen it
+    def get_upload(self, upload_id):
+        rows = self._execute(
+            "SELECT upload_id, username, pack_name, source, params, state FROM uploads WHERE upload_id = ?",
+            (upload_id,)
+        )
+        if not rows:
+            return None
+        upload_id, username, pack_name, source, params, state = rows[0]
+        return {"upload_id": upload_id, "username": username, "pack_name": pack_name,
+                "source": source, "params": json.loads(params), "state": state}
+
+    # Uploads that did not finish cleanly, newest first
+    def unfinished_uploads(self, username=None):
+        rows = self._execute(
+            "SELECT upload_id FROM uploads WHERE state != 'completed' AND (? IS NULL OR username = ?) "
+            "ORDER BY created_at DESC",
+            (username, username)
+        )
+        return [self.get_upload(row[0]) for row in rows]
+
+    # {batch_number: batch_key} of the batches already delivered for an upload
+    def completed_batches(self, upload_id):
+        rows = self._execute("SELECT batch_number, batch_key FROM batches WHERE upload_id = ?", (upload_id,))
+        return dict(rows)
+
+    def mark_batch_done(self, upload_id, batch_number, key):
+        self._execute(
+            "INSERT OR REPLACE INTO batches (upload_id, batch_number, batch_key, completed_at) VALUES (?, ?, ?, ?)",
+            (upload_id, batch_number, key, time.time())
+        )
+
+    # Close an upload. Completed uploads drop their batch checkpoints; others
+    # keep them for resume_upload.
+    def finish_upload(self, upload_id, completed):
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE uploads SET state = ?, updated_at = ? WHERE upload_id = ?",
+                ('completed' if completed else 'incomplete', time.time(), upload_id)
+            )
+            if completed:
+                connection.execute("DELETE FROM batches WHERE upload_id = ?", (upload_id,))
+
+    # Record that a pack's vectors are to be deleted, before the deletion is
+    # attempted, so a failed or interrupted deletion is retried later
+    def add_pending_deletion(self, username, pack_name):
+        now = time.time()
+        self._execute(
+            "INSERT INTO pending_deletions (username, pack_name, attempts, last_error, created_at, updated_at) "
+            "VALUES (?, ?, 0, NULL, ?, ?) ON CONFLICT(username, pack_name) DO NOTHING",
+            (username, pack_name, now, now)
+        )
+
+    def record_deletion_attempt(self, username, pack_name, error):
+        self._execute(
+            "UPDATE pending_deletions SET attempts = attempts + 1, last_error = ?, updated_at = ? "
+            "WHERE username = ? AND pack_name = ?",
+            (error, time.time(), username, pack_name)
+        )
+
+    def clear_pending_deletion(self, username, pack_name):
+        self._execute("DELETE FROM pending_deletions WHERE username = ? AND pack_name = ?", (username, pack_name))
+
+    # Packs whose vectors still have to be deleted, oldest first
+    def pending_deletions(self, username=None):
+        rows = self._execute(
+            "SELECT username, pack_name, attempts, last_error FROM pending_deletions "
+            "WHERE (? IS NULL OR username = ?) ORDER BY created_at",
+            (username, username)
+        )
+        return [{"username": username, "pack_name": pack_name, "attempts": attempts, "last_error": last_error}
+                for username, pack_name, attempts, last_error in rows]
+
+    # {key: (etag, params)} of the S3 objects of a bucket uploaded to a pack
+    def s3_objects(self, username, pack_name, bucket):
+        rows = self._execute(
+            "SELECT object_key, etag, params FROM s3_objects WHERE username = ? AND pack_name = ? AND bucket = ?",
+            (username, pack_name, bucket)
+        )
+        return {key: (etag, json.loads(params)) for key, etag, params in rows}
+
+    # Record that an S3 object, as of etag, was uploaded to a pack with params
+    def mark_s3_object(self, username, pack_name, bucket, key, etag, params):
+        self._execute(
+            "INSERT OR REPLACE INTO s3_objects (username, pack_name, bucket, object_key, etag, params, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (username, pack_name, bucket, key, etag, json.dumps(params), time.time())
+        )
+
+    def forget_s3_object(self, username, pack_name, bucket, key):
+        self._execute(
+            "DELETE FROM s3_objects WHERE username = ? AND pack_name = ? AND bucket = ? AND object_key = ?",
+            (username, pack_name, bucket, key)
+        )
+
+    # Forget every S3 object uploaded to a pack, e.g. after the pack is deleted
+    def forget_pack_s3_objects(self, username, pack_name):
+        self._execute("DELETE FROM s3_objects WHERE username = ? AND pack_name = ?", (username, pack_name))
+
+_default_journal = None
+_default_journal_lock = threading.Lock()
+
+# Journal shared by every upload in this process
+def get_upload_journal():
+    global _default_journal
+    with _default_journal_lock:
+        if _default_journal is None:
+            _default_journal = UploadJournal()
+        return _default_journal
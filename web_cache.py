@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Where fetched pages and their chunks are kept, and how much disk they may use
+WEB_CACHE_DIR = os.getenv('WEB_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'packman_web_cache'))
+WEB_CACHE_MAX_BYTES = int(os.getenv('WEB_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Seconds a cached page is served without asking the server whether it changed
+WEB_CACHE_TTL = int(os.getenv('WEB_CACHE_TTL', '300'))
+
+# On-disk, size-bounded LRU cache of fetched web pages and their split chunks.
+# Each page entry stores the page text with its ETag/Last-Modified validators so
+# it can be revalidated with a conditional request. Chunk entries are keyed by
+# URL, page content and splitter settings. Recency is tracked with file mtimes.
+class WebCache:
+    def __init__(self, directory=WEB_CACHE_DIR, max_bytes=WEB_CACHE_MAX_BYTES, ttl=WEB_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind, *parts):
+        digest = hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{kind}-{digest}.json")
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, path, entry):
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning("Could not write web cache entry %s: %s", path, e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for item in os.scandir(self.directory):
+                if not item.name.endswith('.json'):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            # Drop least recently used entries until the cache fits again
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                logging.info("Evicted web cache entry %s", os.path.basename(path))
+                if total <= self.max_bytes:
+                    break
+
+    # Cached page entry for a URL, or None
+    def get_page(self, url):
+        return self._read(self._path('page', url))
+
+    # Whether a cached page can be used without revalidating it
+    def is_fresh(self, page):
+        return time.time() - page.get('checked_at', 0) < self.ttl
+
+    def put_page(self, url, text, etag=None, last_modified=None):
+        page = {
+            'url': url,
+            'text': text,
+            'digest': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'checked_at': time.time(),
+        }
+        self._write(self._path('page', url), page)
+        return page
+
+    # Record that the server confirmed the cached page is still current
+    def mark_validated(self, url, page):
+        page['checked_at'] = time.time()
+        self._write(self._path('page', url), page)
+
+    # Cached chunks of a page for the given splitter settings, or None
+    def get_chunks(self, url, digest, settings):
+        entry = self._read(self._path('chunks', url, digest, settings))
+        return entry['chunks'] if entry else None
+
+    def put_chunks(self, url, digest, settings, chunks):
+        self._write(self._path('chunks', url, digest, settings), {'url': url, 'chunks': chunks})
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Shared cache instance for this process
+def get_web_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = WebCache()
+        return _default_cache
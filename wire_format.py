@@ -0,0 +1,63 @@
+import base64
+import json
+import os
+import zlib
+
+# Version of the compact encoding this client writes. Receivers advertise the
+# versions they read through the 'capabilities' action.
+WIRE_FORMAT_VERSION = 1
+
+# zlib level for compact payloads: 1 is fastest, 9 is smallest
+WIRE_COMPRESSION_LEVEL = int(os.getenv('WIRE_COMPRESSION_LEVEL', '6'))
+
+# Errors raised for payloads the decoder cannot read
+class WireFormatError(ValueError):
+    pass
+
+def _pack(value):
+    raw = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.b64encode(zlib.compress(raw, WIRE_COMPRESSION_LEVEL)).decode('ascii')
+
+def _unpack(packed):
+    try:
+        return json.loads(zlib.decompress(base64.b64decode(packed)).decode('utf-8'))
+    except (ValueError, zlib.error) as e:
+        raise WireFormatError(f"Corrupt compact payload: {e}") from e
+
+def _encoding():
+    return {"version": WIRE_FORMAT_VERSION, "layout": "columnar", "codec": "zlib", "framing": "base64"}
+
+def _check_encoding(encoding):
+    if encoding.get('version') != WIRE_FORMAT_VERSION:
+        raise WireFormatError(f"Unsupported wire format version: {encoding.get('version')}")
+
+# Encode records as columnar id and text arrays, compressed and base64-framed.
+# Returns the fields that replace "data" in a create_pack body.
+def encode_records(records):
+    columns = {"ids": [record['id'] for record in records], "texts": [record['text'] for record in records]}
+    return {"encoding": _encoding(), "count": len(records), "data_packed": _pack(columns)}
+
+# Encode a list of ids for delete_records. Returns the fields that replace "ids".
+def encode_ids(ids):
+    return {"encoding": _encoding(), "count": len(ids), "ids_packed": _pack(list(ids))}
+
+# Reference decoder: records of a create_pack body in either format
+def decode_records(body):
+    if 'data_packed' not in body:
+        return body['data']
+    _check_encoding(body.get('encoding', {}))
+    columns = _unpack(body['data_packed'])
+    ids, texts = columns['ids'], columns['texts']
+    if len(ids) != len(texts) or len(ids) != body.get('count', len(ids)):
+        raise WireFormatError("Compact payload record count does not match")
+    return [{"id": id_, "text": text} for id_, text in zip(ids, texts)]
+
+# Reference decoder: ids of a delete_records body in either format
+def decode_ids(body):
+    if 'ids_packed' not in body:
+        return body['ids']
+    _check_encoding(body.get('encoding', {}))
+    ids = _unpack(body['ids_packed'])
+    if len(ids) != body.get('count', len(ids)):
+        raise WireFormatError("Compact payload id count does not match")
+    return ids